@@ -12,23 +12,27 @@ import time
 import logging
 from datetime import datetime
 import functools
+import gzip
+import hashlib
 import random
 
 from flask import Flask, request, jsonify, render_template, redirect, url_for, session
 from flask_cors import CORS
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
 
 # 抑制SSL警告
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 from config import Config
-from utils import format_answer_for_ocs, parse_question_and_options, extract_answer
+from utils import format_answer_for_ocs, parse_question_and_options, extract_answer, cached_response
 from models import QARecord, UserSession, get_db_session, close_db_session, get_user_by_id
 from services import RedisCache
 # 移除旧的provider_manager和key_switcher，直接使用代理池系统
 from services.model_service import SyncModelService
 from routes.auth import auth_bp
 from routes.proxy_pool import proxy_pool_bp
-from routes.questions import questions_bp
+from routes.questions import questions_bp, invalidate_type_counts, save_single_record, ALLOWED_ORIGINS
 from routes.settings import settings_bp
 from routes.logs import logs_bp
 from routes.image_proxy import register_image_proxy_bp
@@ -100,7 +104,7 @@ app = Flask(__name__)
 # 这对于开发和测试非常有用，但在生产环境中应该更加限制
 CORS(app,
      supports_credentials=True,
-     origins=["https://mooc2-ans.chaoxing.com", "http://localhost:8080", "http://127.0.0.1:8080"],  # 指定允许的来源
+     origins=sorted(ALLOWED_ORIGINS),  # 指定允许的来源，与题目录入接口共用同一份列表
      allow_headers=["Content-Type", "Authorization", "X-Requested-With"],  # 指定允许的头信息
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
      expose_headers=["Content-Length", "X-Total-Count"],
@@ -124,6 +128,9 @@ from flask import g
 @app.before_request
 def setup_request():
     """在每个请求前创建一个新的数据库会话"""
+    # CORS预检请求由 flask_cors 直接应答，不需要数据库会话
+    if request.method == 'OPTIONS':
+        return
     try:
         session = get_db_session()
         if session is None:
@@ -467,29 +474,13 @@ def search():
             logger.info(f"题目字段不全，未写入数据库。题型: {question_type}, 问题: {question[:30]}, 选项: {options}, 答案: {processed_answer}")
             return jsonify(format_answer_for_ocs(question, processed_answer))
 
-        # 查重：如已存在则更新，否则插入
-        db_session = get_db_session()
-        existing = db_session.query(QARecord).filter(
-            QARecord.question == question,
-            QARecord.type == question_type,
-            QARecord.options == options
-        ).first()
-        if existing:
-            existing.answer = processed_answer
-            existing.created_at = datetime.now()
-        else:
-            qa_record = QARecord(
-                question=question,
-                type=question_type,
-                options=options,
-                answer=processed_answer,
-                created_at=datetime.now()
-            )
-            db_session.add(qa_record)
-        try:
-            db_session.commit()
-        finally:
-            close_db_session(db_session)
+        # 查重：如已存在则更新，否则插入；并发的相同搜索由唯一索引冲突转为更新
+        db_session = g.db
+        updated = save_single_record(db_session, question, question_type, options, processed_answer)
+        db_session.commit()
+        if not updated:
+            # 新增了题目，题型统计需要刷新
+            invalidate_type_counts()
 
         # 记录处理时间
         process_time = time.time() - start_time
@@ -560,6 +551,7 @@ def health_check():
 
 @app.route('/api/health/detailed', methods=['GET'])
 @rate_limit(limit=10, period=60)
+@cached_response(timeout=3)
 def detailed_health_check():
     """详细健康检查接口"""
     try:
@@ -698,48 +690,54 @@ def update_record():
     try:
         data = request.get_json()
         record_id = int(data.get('record_id', -1))
-        # 获取数据库会话
-        db_session = get_db_session()
-        # 查询记录
-        record = db_session.query(QARecord).filter(QARecord.id == record_id).first()
-        if not record:
-            return jsonify({
-                'success': False,
-                'message': '记录不存在'
-            })
-        # 检查是否有可更新字段（None或空字符串都视为未更新）
-        updatable = False
-        for field in ['question', 'type', 'options', 'answer']:
-            if field in data and data[field] is not None and str(data[field]).strip() != '':
-                updatable = True
-                break
-        if not updatable:
+        # 使用请求级别的数据库会话，请求结束时统一关闭
+        db_session = g.db
+        # 只保留有效的可更新字段（None或空字符串都视为未更新）
+        values = {
+            field: data[field]
+            for field in ('question', 'type', 'options', 'answer')
+            if field in data and data[field] is not None and str(data[field]).strip() != ''
+        }
+        if not values:
+            if db_session.get(QARecord, record_id) is None:
+                return jsonify({
+                    'success': False,
+                    'message': '记录不存在'
+                })
             # 记录无效更新请求
             app.logger.info(f"无效题目更新请求：仅传record_id={record_id}，无其它字段")
             return jsonify({
                 'success': False,
                 'message': '未提供任何可更新字段，未做任何更改'
             })
-        # 更新记录
-        if 'question' in data and data['question'] is not None and str(data['question']).strip() != '':
-            record.question = data['question']
-        if 'type' in data and data['type'] is not None and str(data['type']).strip() != '':
-            record.type = data['type']
-        if 'options' in data and data['options'] is not None and str(data['options']).strip() != '':
-            record.options = data['options']
-        if 'answer' in data and data['answer'] is not None and str(data['answer']).strip() != '':
-            record.answer = data['answer']
+        # 直接执行 UPDATE，不加载ORM对象
         try:
-            db_session.commit()
-            # 如果启用了缓存，更新缓存
-            if Config.ENABLE_CACHE:
-                cache.delete(f'qa_{record_id}')
+            result = db_session.execute(
+                update(QARecord).where(QARecord.id == record_id).values(**values)
+            )
+        except IntegrityError:
+            # 修改后与另一条记录的题干、类型、选项完全相同，违反 uq_qa_sig 唯一索引
+            db_session.rollback()
             return jsonify({
-                'success': True,
-                'message': '记录已更新'
+                'success': False,
+                'message': '已存在相同的题目（题干、类型、选项一致），未保存修改'
+            }), 409
+        if result.rowcount == 0:
+            db_session.rollback()
+            return jsonify({
+                'success': False,
+                'message': '记录不存在'
             })
-        finally:
-            close_db_session(db_session)
+        db_session.commit()
+        if 'type' in values:
+            invalidate_type_counts()
+        # 如果启用了缓存，更新缓存
+        if Config.ENABLE_CACHE:
+            cache.delete(f'qa_{record_id}')
+        return jsonify({
+            'success': True,
+            'message': '记录已更新'
+        })
     except Exception as e:
         app.logger.error(f"更新记录异常: {e}")
         return jsonify({
@@ -755,10 +753,10 @@ def delete_record():
     try:
         data = request.get_json()
         record_id = int(data.get('record_id', -1))
-        # 获取数据库会话
-        db_session = get_db_session()
+        # 使用请求级别的数据库会话，请求结束时统一关闭
+        db_session = g.db
         # 查询记录
-        record = db_session.query(QARecord).filter(QARecord.id == record_id).first()
+        record = db_session.get(QARecord, record_id)
         if not record:
             return jsonify({
                 'success': False,
@@ -772,14 +770,12 @@ def delete_record():
                 logger.warning(f"删除缓存时发生错误: {str(e)}")
         logger.info(f"删除记录 {record.id}: '{record.question[:30]}...'")
         db_session.delete(record)
-        try:
-            db_session.commit()
-            return jsonify({
-                'success': True,
-                'message': '记录已删除'
-            })
-        finally:
-            close_db_session(db_session)
+        db_session.commit()
+        invalidate_type_counts()
+        return jsonify({
+            'success': True,
+            'message': '记录已删除'
+        })
     except Exception as e:
         logger.error(f"删除记录时发生错误: {str(e)}", exc_info=True)
         return jsonify({
@@ -796,8 +792,8 @@ def login_required(view_func):
             # 检查cookies中是否有会话ID
             session_id = request.cookies.get('session_id')
             if session_id:
-                # 获取数据库会话
-                db_session = get_db_session()
+                # 使用请求级别的数据库会话
+                db_session = g.db
                 # 验证会话
                 user_id = UserSession.validate_session(db_session, session_id)
                 if user_id:
@@ -860,9 +856,23 @@ def dashboard():
     minutes = int((uptime_seconds % 3600) // 60)
     uptime_str = f"{days}天{hours}小时{minutes}分钟"
 
-    # 从数据库获取记录
-    records = g.db.query(QARecord).order_by(QARecord.created_at.desc()).limit(100).all()
-    records_data = [record.to_dict() for record in records]
+    # 从数据库获取记录：只查模板需要的列，返回普通行，不构建ORM对象
+    rows = g.db.execute(
+        select(QARecord.id, QARecord.question, QARecord.type, QARecord.options,
+               QARecord.answer, QARecord.created_at)
+        .order_by(QARecord.created_at.desc())
+        .limit(100)
+        .execution_options(yield_per=100)
+    )
+    records_data = [{
+        'id': row.id,
+        'question': row.question,
+        'type': row.type,
+        'options': row.options,
+        'answer': row.answer,
+        'time': row.created_at.isoformat(sep=' ', timespec='seconds') if row.created_at else None,
+        'timestamp': row.created_at.isoformat() if row.created_at else None
+    } for row in rows]
 
     # 安全获取缓存大小
     cache_size = cache.size if (Config.ENABLE_CACHE and cache is not None) else 0
@@ -920,6 +930,21 @@ def register():
     # 禁止注册，显示提示信息
     return render_template('error.html', error='当前系统已关闭注册，如需账号请联系管理员。')
 
+# /api/key_pool 的响应缓存：代理池状态不变时复用已序列化的响应体和ETag
+_key_pool_cache = {'entry': None}
+
+def _key_pool_response(entry):
+    """根据缓存条目构建响应，客户端支持时返回预先压缩好的gzip响应体"""
+    _, etag, body, body_gz = entry
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = app.response_class(body_gz, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = app.response_class(body, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag, weak=True)
+    return response.make_conditional(request)
+
 @app.route('/api/key_pool', methods=['GET'])
 def key_pool():
     """
@@ -944,8 +969,18 @@ def key_pool():
             updated_at = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')
         except Exception as e:
             logger.warning(f"获取配置文件修改时间失败: {str(e)}")
+            mtime = None
             updated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
+        # 配置文件和代理运行状态都没变时，直接复用上次的响应（带If-None-Match时返回304）
+        state = (mtime, tuple(
+            (proxy.name, proxy.is_active, proxy.priority, proxy.current_api_key, tuple(proxy.api_keys), proxy.model)
+            for proxy in proxy_pool.proxies
+        ))
+        entry = _key_pool_cache['entry']
+        if mtime is not None and entry is not None and entry[0] == state:
+            return _key_pool_response(entry)
+
         # 构建代理信息
         proxies_info = []
         total_keys = 0
@@ -983,7 +1018,7 @@ def key_pool():
             if proxy.is_active:
                 active_proxies += 1
 
-        return jsonify({
+        response = jsonify({
             'proxies': proxies_info,
             'total_keys': total_keys,
             'active_proxies': active_proxies,
@@ -991,6 +1026,12 @@ def key_pool():
             'updated_at': updated_at,
             'status': 'success'
         })
+        body = response.get_data()
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        # 压缩只在缓存刷新时做一次，之后的请求直接复用
+        entry = (state, etag, body, gzip.compress(body, compresslevel=1))
+        _key_pool_cache['entry'] = entry
+        return _key_pool_response(entry)
 
     except Exception as e:
         logger.error(f"获取代理池密钥信息失败: {str(e)}")
@@ -63,6 +63,12 @@ class Config:
     DB_PASSWORD = _config.get('database', {}).get('password', "123456")
     DB_NAME = _config.get('database', {}).get('name', "ocs_qa")
 
+    # 数据库连接池配置：每个worker常驻 POOL_SIZE 个连接，高峰可再借 MAX_OVERFLOW 个
+    DB_POOL_SIZE = int(_config.get('database', {}).get('pool_size', 20))
+    DB_MAX_OVERFLOW = int(_config.get('database', {}).get('max_overflow', 10))
+    DB_POOL_TIMEOUT = int(_config.get('database', {}).get('pool_timeout', 30))  # 等待空闲连接的秒数
+    DB_POOL_RECYCLE = int(_config.get('database', {}).get('pool_recycle', 1800))  # 早于MySQL wait_timeout回收连接
+
     # 数据库连接字符串
     SQLALCHEMY_DATABASE_URI = f"{DB_TYPE}+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
 
@@ -76,7 +82,6 @@ class Config:
 def update_config(new_config):
     """更新系统配置"""
     from config import Config
-    import json
     # 更新运行时配置
     Config.ENABLE_CACHE = new_config.get('ENABLE_CACHE', Config.ENABLE_CACHE)
     Config.CACHE_EXPIRATION = new_config.get('CACHE_EXPIRATION', Config.CACHE_EXPIRATION)
@@ -107,7 +112,11 @@ def update_config(new_config):
             'port': Config.DB_PORT,
             'user': Config.DB_USER,
             'password': Config.DB_PASSWORD,
-            'name': Config.DB_NAME
+            'name': Config.DB_NAME,
+            'pool_size': Config.DB_POOL_SIZE,
+            'max_overflow': Config.DB_MAX_OVERFLOW,
+            'pool_timeout': Config.DB_POOL_TIMEOUT,
+            'pool_recycle': Config.DB_POOL_RECYCLE
         },
         'redis': {
             'enabled': Config.REDIS_ENABLED,
@@ -120,9 +129,8 @@ def update_config(new_config):
             'enable': Config.ENABLE_RECORD
         }
     }
-    try:
-        with open('config.json', 'w', encoding='utf-8') as f:
-            json.dump(config_data, f, indent=4, ensure_ascii=False)
-        return True
-    except Exception as e:
-        raise e
\ No newline at end of file
+    # 与设置页面等其他写入方共用同一把锁，原子替换写回
+    from routes.settings import save_config, config_write_lock
+    with config_write_lock():
+        save_config(config_data)
+    return True
\ No newline at end of file
@@ -7,6 +7,7 @@
 
 import sys
 import os
+import functools
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from sqlalchemy import text
@@ -15,81 +16,327 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-def add_search_optimization_fields():
-    """添加搜索优化相关字段"""
-
-    # 要添加的字段定义
-    new_fields = [
-        {
-            'name': 'question_length',
-            'sql': 'ALTER TABLE qa_records ADD COLUMN question_length INTEGER DEFAULT 0',
-            'description': '题目长度字段'
-        },
-        {
-            'name': 'is_favorite',
-            'sql': 'ALTER TABLE qa_records ADD COLUMN is_favorite BOOLEAN DEFAULT FALSE',
-            'description': '收藏状态字段'
-        },
-        {
-            'name': 'view_count',
-            'sql': 'ALTER TABLE qa_records ADD COLUMN view_count INTEGER DEFAULT 0',
-            'description': '查看次数字段'
-        },
-        {
-            'name': 'last_viewed',
-            'sql': 'ALTER TABLE qa_records ADD COLUMN last_viewed DATETIME',
-            'description': '最后查看时间字段'
-        },
-        {
-            'name': 'difficulty',
-            'sql': 'ALTER TABLE qa_records ADD COLUMN difficulty VARCHAR(10) DEFAULT \'medium\'',
-            'description': '难度等级字段'
-        },
-        {
-            'name': 'tags',
-            'sql': 'ALTER TABLE qa_records ADD COLUMN tags TEXT',
-            'description': '标签字段'
-        },
-        {
-            'name': 'source',
-            'sql': 'ALTER TABLE qa_records ADD COLUMN source VARCHAR(100)',
-            'description': '题目来源字段'
-        },
-        {
-            'name': 'updated_at',
-            'sql': 'ALTER TABLE qa_records ADD COLUMN updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP',
-            'description': '更新时间字段'
-        }
-    ]
-
-    # 要添加的索引（MySQL语法）
-    new_indexes = [
-        {
-            'name': 'idx_qa_records_type',
-            'sql': 'CREATE INDEX idx_qa_records_type ON qa_records(type)',
-            'description': '题目类型索引'
-        },
-        {
-            'name': 'idx_qa_records_created_at',
-            'sql': 'CREATE INDEX idx_qa_records_created_at ON qa_records(created_at)',
-            'description': '创建时间索引'
-        },
-        {
-            'name': 'idx_qa_records_is_favorite',
-            'sql': 'CREATE INDEX idx_qa_records_is_favorite ON qa_records(is_favorite)',
-            'description': '收藏状态索引'
+# 要添加的字段定义
+NEW_FIELDS = [
+    {
+        'name': 'question_length',
+        # 虚拟生成列：由数据库根据question计算，无需回填，也不会在写入时放大
+        'sql': {
+            'mysql': 'ALTER TABLE qa_records ADD COLUMN question_length INT AS (CHAR_LENGTH(question)) VIRTUAL, '
+                     'ADD INDEX idx_qa_qlen (question_length)',
+            'sqlite': 'ALTER TABLE qa_records ADD COLUMN question_length INTEGER '
+                      'GENERATED ALWAYS AS (length(question)) VIRTUAL'
         },
-        {
-            'name': 'idx_qa_records_difficulty',
-            'sql': 'CREATE INDEX idx_qa_records_difficulty ON qa_records(difficulty)',
-            'description': '难度等级索引'
+        'description': '题目长度字段（虚拟生成列）'
+    },
+    {
+        'name': 'is_favorite',
+        'sql': 'ALTER TABLE qa_records ADD COLUMN is_favorite BOOLEAN DEFAULT FALSE',
+        'description': '收藏状态字段'
+    },
+    {
+        'name': 'view_count',
+        'sql': 'ALTER TABLE qa_records ADD COLUMN view_count INTEGER DEFAULT 0',
+        'description': '查看次数字段'
+    },
+    {
+        'name': 'last_viewed',
+        'sql': 'ALTER TABLE qa_records ADD COLUMN last_viewed DATETIME',
+        'description': '最后查看时间字段'
+    },
+    {
+        'name': 'difficulty',
+        # 只有三种取值，MySQL用ENUM（每行1字节），SQLite用CHECK约束
+        'sql': {
+            'mysql': "ALTER TABLE qa_records ADD COLUMN difficulty ENUM('easy','medium','hard') NOT NULL DEFAULT 'medium'",
+            'sqlite': "ALTER TABLE qa_records ADD COLUMN difficulty TEXT NOT NULL DEFAULT 'medium' "
+                      "CHECK(difficulty IN ('easy','medium','hard'))"
         },
-        {
-            'name': 'idx_qa_records_view_count',
-            'sql': 'CREATE INDEX idx_qa_records_view_count ON qa_records(view_count)',
-            'description': '查看次数索引'
-        }
-    ]
+        'description': '难度等级字段'
+    },
+    {
+        'name': 'sig_hash',
+        # 存储生成列：题干、类型、选项的SHA1，配合唯一索引实现导入时的 ON DUPLICATE KEY UPDATE
+        'sql': "ALTER TABLE qa_records ADD COLUMN sig_hash CHAR(40) AS "
+               "(SHA1(CONCAT_WS(CHAR(31), question, COALESCE(type, ''), COALESCE(options, '')))) STORED",
+        'description': '查重签名字段（存储生成列）',
+        'dialect': 'mysql'
+    },
+    {
+        'name': 'tags',
+        'sql': 'ALTER TABLE qa_records ADD COLUMN tags TEXT',
+        'description': '标签字段'
+    },
+    {
+        'name': 'source',
+        'sql': 'ALTER TABLE qa_records ADD COLUMN source VARCHAR(100)',
+        'description': '题目来源字段'
+    },
+    {
+        'name': 'updated_at',
+        'sql': 'ALTER TABLE qa_records ADD COLUMN updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP',
+        'description': '更新时间字段'
+    }
+]
+
+# 要添加的索引
+# 常见查询会同时按类型、收藏、难度筛选并按查看次数/时间排序，
+# 使用一个复合索引代替多个单列索引，避免index merge
+NEW_INDEXES = [
+    {
+        'name': 'idx_qa_hot',
+        'sql': 'CREATE INDEX idx_qa_hot ON qa_records(type, is_favorite, difficulty, view_count DESC, created_at DESC)',
+        'description': '搜索热点字段复合索引'
+    },
+    {
+        'name': 'idx_qa_qlen',
+        'sql': 'CREATE INDEX idx_qa_qlen ON qa_records(question_length)',
+        'description': '题目长度索引（MySQL在添加字段时一并创建）',
+        'dialect': 'sqlite'
+    },
+    {
+        'name': 'idx_qa_records_created_at',
+        'sql': 'CREATE INDEX idx_qa_records_created_at ON qa_records(created_at)',
+        'description': '创建时间索引（无筛选条件时按时间排序）'
+    },
+    {
+        'name': 'idx_qa_fav',
+        'sql': 'CREATE INDEX idx_qa_fav ON qa_records(created_at) WHERE is_favorite = 1',
+        'description': '收藏题目部分索引',
+        'dialect': 'sqlite'  # MySQL不支持部分索引
+    },
+    {
+        'name': 'uq_qa_sig',
+        # 早期版本的先查后插存在竞争，库中可能已有重复题目：同一签名只保留ID最大的一条
+        'prepare': [
+            "DELETE q FROM qa_records q JOIN ("
+            "SELECT sig_hash, MAX(id) AS keep_id FROM qa_records "
+            "GROUP BY sig_hash HAVING COUNT(*) > 1"
+            ") d ON q.sig_hash = d.sig_hash AND q.id < d.keep_id"
+        ],
+        'sql': 'CREATE UNIQUE INDEX uq_qa_sig ON qa_records(sig_hash)',
+        'description': '查重签名唯一索引（导入时 ON DUPLICATE KEY UPDATE 依赖此索引）',
+        'dialect': 'mysql',
+        # 创建失败时导入查重会静默失效，必须中止迁移
+        'required': True
+    },
+    {
+        'name': 'idx_qa_dedupe',
+        'sql': 'CREATE INDEX idx_qa_dedupe ON qa_records(question(255), type, options(255))',
+        'description': '导入查重复合索引（TEXT列使用前缀）',
+        'dialect': 'mysql'
+    },
+    {
+        'name': 'idx_qa_dedupe',
+        'sql': 'CREATE INDEX idx_qa_dedupe ON qa_records(question, type, options)',
+        'description': '导入查重复合索引',
+        'dialect': 'sqlite'
+    },
+    {
+        'name': 'ft_question_answer',
+        'sql': 'ALTER TABLE qa_records ADD FULLTEXT INDEX ft_question_answer (question, answer) WITH PARSER ngram',
+        'description': '题目+答案全文索引（导出按关键词筛选时使用）',
+        'dialect': 'mysql'
+    },
+    {
+        'name': 'question_type_stats',
+        'sql': [
+            "CREATE TABLE IF NOT EXISTS question_type_stats ("
+            "type VARCHAR(20) NOT NULL PRIMARY KEY, count BIGINT NOT NULL DEFAULT 0)",
+            # 触发器随 qa_records 的增删改同步计数，任何写入路径都不会漏计
+            "DROP TRIGGER IF EXISTS qa_records_type_stats_ai",
+            "CREATE TRIGGER qa_records_type_stats_ai AFTER INSERT ON qa_records FOR EACH ROW "
+            "INSERT INTO question_type_stats (type, count) VALUES (COALESCE(NEW.type, ''), 1) "
+            "ON DUPLICATE KEY UPDATE count = count + 1",
+            "DROP TRIGGER IF EXISTS qa_records_type_stats_ad",
+            "CREATE TRIGGER qa_records_type_stats_ad AFTER DELETE ON qa_records FOR EACH ROW "
+            "UPDATE question_type_stats SET count = count - 1 WHERE type = COALESCE(OLD.type, '')",
+            "DROP TRIGGER IF EXISTS qa_records_type_stats_au",
+            "CREATE TRIGGER qa_records_type_stats_au AFTER UPDATE ON qa_records FOR EACH ROW "
+            "BEGIN IF NOT (NEW.type <=> OLD.type) THEN "
+            "UPDATE question_type_stats SET count = count - 1 WHERE type = COALESCE(OLD.type, ''); "
+            "INSERT INTO question_type_stats (type, count) VALUES (COALESCE(NEW.type, ''), 1) "
+            "ON DUPLICATE KEY UPDATE count = count + 1; "
+            "END IF; END",
+            # 用当前数据重建计数
+            "DELETE FROM question_type_stats",
+            "INSERT INTO question_type_stats (type, count) "
+            "SELECT COALESCE(type, ''), COUNT(*) FROM qa_records GROUP BY COALESCE(type, '')"
+        ],
+        'description': '题型计数表及维护触发器',
+        'dialect': 'mysql'
+    },
+    {
+        'name': 'qa_records_fts',
+        'sql': [
+            "CREATE VIRTUAL TABLE IF NOT EXISTS qa_records_fts USING fts5("
+            "question, content='qa_records', content_rowid='id', tokenize='unicode61')",
+            "INSERT INTO qa_records_fts(qa_records_fts) VALUES('rebuild')",
+            # 触发器保持全文索引与qa_records同步
+            "CREATE TRIGGER IF NOT EXISTS qa_records_fts_ai AFTER INSERT ON qa_records BEGIN "
+            "INSERT INTO qa_records_fts(rowid, question) VALUES (new.id, new.question); END",
+            "CREATE TRIGGER IF NOT EXISTS qa_records_fts_ad AFTER DELETE ON qa_records BEGIN "
+            "INSERT INTO qa_records_fts(qa_records_fts, rowid, question) VALUES ('delete', old.id, old.question); END",
+            "CREATE TRIGGER IF NOT EXISTS qa_records_fts_au AFTER UPDATE OF question ON qa_records BEGIN "
+            "INSERT INTO qa_records_fts(qa_records_fts, rowid, question) VALUES ('delete', old.id, old.question); "
+            "INSERT INTO qa_records_fts(rowid, question) VALUES (new.id, new.question); END"
+        ],
+        'description': '题目全文索引（FTS5虚拟表）',
+        'dialect': 'sqlite'
+    }
+]
+
+# 已被复合索引取代的旧单列索引（早期版本迁移创建），以及没有查询使用的 ft_question
+# （导出的 MATCH 使用 ft_question_answer，单列 ngram 全文索引只会放大写入）
+OBSOLETE_INDEXES = [
+    'idx_qa_records_type',
+    'idx_qa_records_is_favorite',
+    'idx_qa_records_difficulty',
+    'idx_qa_records_view_count',
+    'ft_question'
+]
+
+# 迁移中用到的SQL在模块加载时一次性预编译为text()对象，循环中直接复用
+def _compile_sql(sql):
+    """将SQL字符串（或按方言/多条语句组织的SQL）预编译为text()对象"""
+    if isinstance(sql, dict):
+        return {dialect: _compile_sql(value) for dialect, value in sql.items()}
+    if isinstance(sql, list):
+        return [text(statement) for statement in sql]
+    return text(sql)
+
+for _definition in NEW_FIELDS + NEW_INDEXES:
+    _definition['sql'] = _compile_sql(_definition['sql'])
+    if 'prepare' in _definition:
+        _definition['prepare'] = _compile_sql(_definition['prepare'])
+
+DROP_INDEX_SQL = {
+    name: _compile_sql({
+        'mysql': f"DROP INDEX {name} ON qa_records",
+        'sqlite': f"DROP INDEX IF EXISTS {name}"
+    })
+    for name in OBSOLETE_INDEXES
+}
+
+COLUMNS_SQL = _compile_sql({
+    'mysql': "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+             "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table",
+    'sqlite': "SELECT name FROM pragma_table_info(:table)"
+})
+
+INDEX_EXISTS_SQL = text(
+    "SELECT 1 FROM information_schema.STATISTICS "
+    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND INDEX_NAME = :index LIMIT 1"
+)
+
+COLUMN_EXTRA_SQL = text(
+    "SELECT EXTRA FROM information_schema.COLUMNS "
+    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = :column"
+)
+
+COLUMN_DATA_TYPE_SQL = text(
+    "SELECT DATA_TYPE FROM information_schema.COLUMNS "
+    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = :column"
+)
+
+# 早期版本迁移创建的difficulty是VARCHAR，先规范取值再转换为ENUM
+CONVERT_DIFFICULTY_SQL = [
+    text(
+        "UPDATE qa_records SET difficulty = 'medium' "
+        "WHERE difficulty IS NULL OR difficulty NOT IN ('easy','medium','hard')"
+    ),
+    text(
+        "ALTER TABLE qa_records MODIFY COLUMN difficulty "
+        "ENUM('easy','medium','hard') NOT NULL DEFAULT 'medium'"
+    )
+]
+
+CONVERT_QUESTION_LENGTH_SQL = text(
+    'ALTER TABLE qa_records DROP COLUMN question_length, '
+    'ADD COLUMN question_length INT AS (CHAR_LENGTH(question)) VIRTUAL, '
+    'ADD INDEX idx_qa_qlen (question_length)'
+)
+
+# 行数估计值（来自统计信息，避免对大表执行COUNT(*)全索引扫描）
+ROW_ESTIMATE_SQL = _compile_sql({
+    'mysql': "SELECT TABLE_ROWS FROM information_schema.TABLES "
+             "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table",
+    'sqlite': "SELECT stat FROM sqlite_stat1 WHERE tbl = :table LIMIT 1"
+})
+
+ANALYZE_SQL = _compile_sql({
+    'mysql': "ANALYZE TABLE qa_records",
+    'sqlite': "ANALYZE qa_records"
+})
+
+# MySQL 8 列直方图，让多列组合筛选的选择性估计更准确
+HISTOGRAM_SQL = text("ANALYZE TABLE qa_records UPDATE HISTOGRAM ON type, difficulty, is_favorite WITH 16 BUCKETS")
+
+def is_mysql(db_session):
+    """判断当前会话是否连接的是MySQL"""
+    return db_session.get_bind().dialect.name == 'mysql'
+
+@functools.lru_cache(maxsize=8)
+def _get_columns(engine, table):
+    """查询表的字段名集合（表不存在时为空集合），结果按(engine, table)缓存"""
+    sql = COLUMNS_SQL['mysql' if engine.dialect.name == 'mysql' else 'sqlite']
+    with engine.connect() as conn:
+        return frozenset(row[0] for row in conn.execute(sql, {'table': table}))
+
+def get_columns(db_session, table='qa_records'):
+    """获取表的现有字段，添加字段后需调用 _get_columns.cache_clear() 使缓存失效"""
+    return _get_columns(db_session.get_bind(), table)
+
+def is_generated_column(db_session, column):
+    """检查MySQL中的字段是否为生成列"""
+    extra = db_session.execute(COLUMN_EXTRA_SQL, {'table': 'qa_records', 'column': column}).scalar()
+    return 'GENERATED' in (extra or '').upper()
+
+def index_exists(db_session, index):
+    """检查MySQL中qa_records表上的索引是否已存在"""
+    return db_session.execute(INDEX_EXISTS_SQL, {'table': 'qa_records', 'index': index}).scalar() is not None
+
+def column_data_type(db_session, column):
+    """获取MySQL中字段的数据类型"""
+    data_type = db_session.execute(COLUMN_DATA_TYPE_SQL, {'table': 'qa_records', 'column': column}).scalar()
+    return (data_type or '').lower()
+
+def estimate_row_count(db_session, table='qa_records'):
+    """从统计信息读取表的估计行数，无统计信息时返回None"""
+    if is_mysql(db_session):
+        return db_session.execute(ROW_ESTIMATE_SQL['mysql'], {'table': table}).scalar()
+    stat = db_session.execute(ROW_ESTIMATE_SQL['sqlite'], {'table': table}).scalar()
+    # sqlite_stat1.stat 的第一个数字是表（或索引）的行数
+    return int(stat.split()[0]) if stat else None
+
+def analyze_table(db_session):
+    """更新qa_records表的统计信息（MySQL上同时构建列直方图）"""
+    mysql = is_mysql(db_session)
+    try:
+        print(f"📊 更新统计信息前估计行数: {estimate_row_count(db_session)}")
+    except Exception:
+        db_session.rollback()
+
+    try:
+        db_session.execute(ANALYZE_SQL['mysql' if mysql else 'sqlite'])
+        db_session.commit()
+        print("✅ 已更新 qa_records 表统计信息")
+    except Exception as e:
+        db_session.rollback()
+        print(f"⚠️ 更新统计信息失败: {str(e)}")
+        return
+
+    if mysql:
+        try:
+            db_session.execute(HISTOGRAM_SQL)
+            db_session.commit()
+            print("✅ 已更新 type, difficulty, is_favorite 列直方图")
+        except Exception as e:
+            db_session.rollback()
+            print(f"⚠️ 更新列直方图失败: {str(e)}")
+
+def add_search_optimization_fields():
+    """添加搜索优化相关字段"""
 
     db_session = None
     try:
@@ -98,38 +345,48 @@ def add_search_optimization_fields():
         print("🔧 开始数据库迁移：添加搜索优化字段")
         print("=" * 60)
 
-        # 检查表是否存在（兼容MySQL和SQLite）
+        # 检查表是否存在并获取现有字段（兼容MySQL和SQLite）
         try:
-            result = db_session.execute(text("SHOW TABLES LIKE 'qa_records'"))
-            if not result.fetchone():
-                print("❌ qa_records表不存在，请先创建基础表结构")
-                return False
-
-            # 获取现有字段（MySQL）
-            result = db_session.execute(text("DESCRIBE qa_records"))
-            existing_columns = {row[0] for row in result.fetchall()}
-        except:
-            # 如果是SQLite
-            try:
-                result = db_session.execute(text("SELECT name FROM sqlite_master WHERE type='table' AND name='qa_records'"))
-                if not result.fetchone():
-                    print("❌ qa_records表不存在，请先创建基础表结构")
-                    return False
+            existing_columns = get_columns(db_session)
+        except Exception as e:
+            print(f"❌ 无法检查表结构: {str(e)}")
+            return False
 
-                result = db_session.execute(text("PRAGMA table_info(qa_records)"))
-                existing_columns = {row[1] for row in result.fetchall()}
-            except Exception as e:
-                print(f"❌ 无法检查表结构: {str(e)}")
-                return False
+        if not existing_columns:
+            print("❌ qa_records表不存在，请先创建基础表结构")
+            return False
 
         print(f"📋 现有字段: {', '.join(sorted(existing_columns))}")
 
+        dialect = db_session.get_bind().dialect.name
+
+        # 早期版本迁移创建的question_length是需要回填的普通列，MySQL上替换为虚拟生成列
+        if dialect == 'mysql' and 'question_length' in existing_columns and not is_generated_column(db_session, 'question_length'):
+            try:
+                db_session.execute(CONVERT_QUESTION_LENGTH_SQL)
+                print("✅ 将 question_length 转换为虚拟生成列")
+            except Exception as e:
+                print(f"⚠️ 转换 question_length 失败: {str(e)}")
+
+        if dialect == 'mysql' and 'difficulty' in existing_columns and column_data_type(db_session, 'difficulty') != 'enum':
+            try:
+                for statement in CONVERT_DIFFICULTY_SQL:
+                    db_session.execute(statement)
+                db_session.commit()
+                print("✅ 将 difficulty 转换为 ENUM 类型")
+            except Exception as e:
+                db_session.rollback()
+                print(f"⚠️ 转换 difficulty 失败: {str(e)}")
+
         # 添加新字段
         added_fields = []
-        for field in new_fields:
+        for field in NEW_FIELDS:
+            if field.get('dialect', dialect) != dialect:
+                continue
             if field['name'] not in existing_columns:
+                field_sql = field['sql'][dialect] if isinstance(field['sql'], dict) else field['sql']
                 try:
-                    db_session.execute(text(field['sql']))
+                    db_session.execute(field_sql)
                     added_fields.append(field['name'])
                     print(f"✅ 添加字段: {field['name']} - {field['description']}")
                 except Exception as e:
@@ -139,56 +396,68 @@ def add_search_optimization_fields():
 
         # 提交字段添加
         db_session.commit()
+        if added_fields:
+            _get_columns.cache_clear()
+
+        # 移除已被复合索引取代的旧索引
+        for index_name in OBSOLETE_INDEXES:
+            drop_sql = DROP_INDEX_SQL[index_name]['mysql' if dialect == 'mysql' else 'sqlite']
+            try:
+                db_session.execute(drop_sql)
+                db_session.commit()
+                print(f"🗑️ 移除旧索引: {index_name}")
+            except Exception:
+                db_session.rollback()
 
         # 添加索引
         added_indexes = []
-        for index in new_indexes:
+        for index in NEW_INDEXES:
+            if index.get('dialect', dialect) != dialect:
+                continue
+            if index.get('required') and index_exists(db_session, index['name']):
+                print(f"⏭️ 索引 {index['name']} 已存在，跳过")
+                continue
+            statements = index['sql'] if isinstance(index['sql'], list) else [index['sql']]
             try:
-                db_session.execute(text(index['sql']))
+                for statement in index.get('prepare', []):
+                    result = db_session.execute(statement)
+                    if result.rowcount:
+                        print(f"🧹 {index['name']}: 清理 {result.rowcount} 条重复记录")
+                for statement in statements:
+                    db_session.execute(statement)
+                # 每个索引单独提交，失败回滚时不影响已创建的索引
+                db_session.commit()
                 added_indexes.append(index['name'])
                 print(f"✅ 添加索引: {index['name']} - {index['description']}")
             except Exception as e:
+                db_session.rollback()
+                if index.get('required'):
+                    print(f"❌ 添加必需索引 {index['name']} 失败: {str(e)}")
+                    return False
                 print(f"⚠️ 添加索引 {index['name']} 失败: {str(e)}")
 
-        # 提交索引添加
-        db_session.commit()
-
-        # 更新现有记录的question_length字段
-        if 'question_length' in added_fields:
-            print("\n🔄 更新现有记录的题目长度...")
-            update_sql = """
-                UPDATE qa_records
-                SET question_length = LENGTH(question)
-                WHERE question_length = 0 OR question_length IS NULL
-            """
-            result = db_session.execute(text(update_sql))
-            db_session.commit()
-            print(f"✅ 更新了 {result.rowcount} 条记录的题目长度")
+        # 最后更新统计信息，让优化器能使用新字段和新索引
+        analyze_table(db_session)
 
         # 验证迁移结果
         print("\n📊 迁移结果验证:")
         try:
-            # MySQL语法
-            result = db_session.execute(text("DESCRIBE qa_records"))
-            final_columns = {row[0] for row in result.fetchall()}
-        except:
-            # SQLite语法
-            try:
-                result = db_session.execute(text("PRAGMA table_info(qa_records)"))
-                final_columns = {row[1] for row in result.fetchall()}
-            except Exception as e:
-                print(f"⚠️ 无法验证字段: {str(e)}")
-                final_columns = set()
+            final_columns = get_columns(db_session)
+        except Exception as e:
+            print(f"⚠️ 无法验证字段: {str(e)}")
+            final_columns = set()
 
         print(f"📋 最终字段数量: {len(final_columns)}")
         print(f"📋 新增字段: {', '.join(added_fields) if added_fields else '无'}")
         print(f"📋 新增索引: {', '.join(added_indexes) if added_indexes else '无'}")
 
-        # 检查记录数量
+        # 检查记录数量（统计信息估计值）
         try:
-            result = db_session.execute(text("SELECT COUNT(*) FROM qa_records"))
-            record_count = result.scalar()
-            print(f"📊 总记录数: {record_count}")
+            record_count = estimate_row_count(db_session)
+            if record_count is None:
+                print("📊 更新统计信息后估计行数: 暂无统计信息")
+            else:
+                print(f"📊 更新统计信息后估计行数: 约 {record_count}")
         except Exception as e:
             print(f"⚠️ 无法获取记录数量: {str(e)}")
 
@@ -227,10 +496,10 @@ def main():
     if args.dry_run:
         print("🔍 预览模式：将要执行的操作")
         print("=" * 60)
-        print("1. 添加字段: question_length, is_favorite, view_count, last_viewed")
+        print("1. 添加字段: question_length（虚拟生成列）, is_favorite, view_count, last_viewed")
         print("2. 添加字段: difficulty, tags, source, updated_at")
-        print("3. 添加索引: type, created_at, is_favorite, difficulty, view_count")
-        print("4. 更新现有记录的question_length值")
+        print("3. 添加索引: (type, is_favorite, difficulty, view_count, created_at) 复合索引, created_at, (question, answer) 全文索引")
+        print("4. 更新表统计信息 (ANALYZE)，MySQL上构建 type/difficulty/is_favorite 列直方图")
         print("\n使用 --rollback 参数可以回滚迁移")
         return
 
@@ -5,6 +5,7 @@
 
 from .models import (
     QARecord, 
+    QuestionTypeStat,
     UserSession, 
     get_db_session, 
     close_db_session, 
@@ -16,6 +17,7 @@ from .models import (
 # 导出所有数据模型和函数
 __all__ = [
     'QARecord',
+    'QuestionTypeStat',
     'UserSession',
     'get_db_session',
     'close_db_session',
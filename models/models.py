@@ -3,58 +3,107 @@
 数据库模型定义
 """
 from datetime import datetime, timedelta
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, create_engine
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Boolean, Enum, Index, Computed, create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, scoped_session
+import atexit
 import hashlib
-import uuid
+import hmac
+import queue
+import secrets
+import threading
+import time
 
 from config import Config
 
 # 创建SQLAlchemy基类
 Base = declarative_base()
 
+# 密码哈希参数（scrypt）
+PASSWORD_HASH_PREFIX = 'scrypt$'
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+def _format_datetime(value):
+    """格式化为 'YYYY-MM-DD HH:MM:SS'，isoformat走纯C实现，比strftime解析格式串更快"""
+    return value.isoformat(sep=' ', timespec='seconds') if value else None
+
 # 问答记录模型
 class QARecord(Base):
     __tablename__ = 'qa_records'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     question = Column(Text, nullable=False, comment='问题内容')
-    type = Column(String(20), nullable=True, comment='问题类型', index=True)
+    type = Column(String(20), nullable=True, comment='问题类型')
     options = Column(Text, nullable=True, comment='选项内容')
     answer = Column(Text, nullable=True, comment='回答内容')
     created_at = Column(DateTime, default=datetime.now, comment='创建时间', index=True)
 
     # 新增字段用于搜索优化
-    question_length = Column(Integer, default=0, comment='题目长度')
-    is_favorite = Column(Boolean, default=False, comment='收藏状态', index=True)
+    question_length = Column(Integer, Computed('CHAR_LENGTH(question)', persisted=False), comment='题目长度')
+    is_favorite = Column(Boolean, default=False, comment='收藏状态')
     view_count = Column(Integer, default=0, comment='查看次数')
     last_viewed = Column(DateTime, nullable=True, comment='最后查看时间')
-    difficulty = Column(String(10), default='medium', comment='难度等级', index=True)  # easy, medium, hard
+    difficulty = Column(Enum('easy', 'medium', 'hard', name='difficulty'), nullable=False, default='medium', comment='难度等级')
     tags = Column(Text, nullable=True, comment='标签，用逗号分隔')
     source = Column(String(100), nullable=True, comment='题目来源')
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment='更新时间')
+    # 查重签名：题干、类型、选项拼接后的SHA1，由数据库生成并建唯一索引，支撑 INSERT ... ON DUPLICATE KEY UPDATE
+    sig_hash = Column(
+        String(40),
+        Computed("SHA1(CONCAT_WS(CHAR(31), question, COALESCE(type, ''), COALESCE(options, '')))", persisted=True),
+        comment='查重签名'
+    )
 
     def to_dict(self):
         """转换为字典"""
+        created_at = self.created_at
         return {
             'id': self.id,
             'question': self.question,
             'type': self.type,
             'options': self.options,
             'answer': self.answer,
-            'time': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'timestamp': self.created_at.isoformat(),
+            'time': _format_datetime(created_at),
+            'timestamp': created_at.isoformat(),
             'question_length': self.question_length or 0,
             'is_favorite': self.is_favorite or False,
             'view_count': self.view_count or 0,
-            'last_viewed': self.last_viewed.strftime('%Y-%m-%d %H:%M:%S') if self.last_viewed else None,
+            'last_viewed': _format_datetime(self.last_viewed),
             'difficulty': self.difficulty or 'medium',
             'tags': self.tags.split(',') if self.tags else [],
             'source': self.source,
-            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S') if self.updated_at else None
+            'updated_at': _format_datetime(self.updated_at)
         }
 
+# 搜索热点字段复合索引（类型、收藏、难度筛选 + 查看次数/时间排序）
+Index(
+    'idx_qa_hot',
+    QARecord.type,
+    QARecord.is_favorite,
+    QARecord.difficulty,
+    QARecord.view_count.desc(),
+    QARecord.created_at.desc()
+)
+Index('idx_qa_qlen', QARecord.question_length)
+Index('uq_qa_sig', QARecord.sig_hash, unique=True)
+# 导入查重复合索引（题干、类型、选项），TEXT 列在 MySQL 上只能建前缀索引
+Index(
+    'idx_qa_dedupe',
+    QARecord.question,
+    QARecord.type,
+    QARecord.options,
+    mysql_length={'question': 255, 'options': 255}
+)
+
+# 题型计数表，由 qa_records 上的触发器维护（见迁移脚本），读取题型统计时不必扫描整张题库
+class QuestionTypeStat(Base):
+    __tablename__ = 'question_type_stats'
+
+    type = Column(String(20), primary_key=True, comment='问题类型，未分类为空字符串')
+    count = Column(BigInteger, nullable=False, default=0, comment='题目数量')
+
 # 用户模型
 class User(Base):
     __tablename__ = 'users'
@@ -73,17 +122,37 @@ class User(Base):
     def set_password(self, password):
         """设置密码"""
         # 生成盐
-        self.salt = uuid.uuid4().hex
+        self.salt = secrets.token_hex(16)
         # 生成密码哈希
         self.password_hash = self._hash_password(password, self.salt)
 
     def verify_password(self, password):
         """验证密码"""
-        return self.password_hash == self._hash_password(password, self.salt)
+        if self.needs_rehash():
+            expected = self._hash_password_legacy(password, self.salt)
+        else:
+            expected = self._hash_password(password, self.salt)
+        return hmac.compare_digest(self.password_hash, expected)
+
+    def needs_rehash(self):
+        """是否为旧版sha256哈希，需要在下次登录时升级"""
+        return not (self.password_hash or '').startswith(PASSWORD_HASH_PREFIX)
 
     def _hash_password(self, password, salt):
         """哈希密码"""
-        # 使用sha256算法和盐值哈希密码
+        # 使用scrypt算法和盐值哈希密码，带版本前缀以区分旧版哈希
+        digest = hashlib.scrypt(
+            password.encode('utf-8'),
+            salt=salt.encode('utf-8'),
+            n=SCRYPT_N,
+            r=SCRYPT_R,
+            p=SCRYPT_P,
+            dklen=32
+        )
+        return PASSWORD_HASH_PREFIX + digest.hex()
+
+    def _hash_password_legacy(self, password, salt):
+        """旧版哈希（sha256 + 盐），仅用于校验历史数据"""
         hash_obj = hashlib.sha256((password + salt).encode('utf-8'))
         return hash_obj.hexdigest()
 
@@ -96,8 +165,8 @@ class User(Base):
             'role': self.role,
             'is_admin': self.is_admin,
             'is_active': self.is_active,
-            'last_login': self.last_login.strftime('%Y-%m-%d %H:%M:%S') if self.last_login else None,
-            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'last_login': _format_datetime(self.last_login),
+            'created_at': _format_datetime(self.created_at),
         }
 
 # 模型供应商模型
@@ -126,6 +195,220 @@ class ModelProvider(Base):
             'max_tokens': self.max_tokens,
         }
 
+# 会话验证缓存：session_id -> (user_id, 过期时间戳)
+SESSION_CACHE_TTL = 300  # Redis缓存最长有效期（秒）
+LOCAL_SESSION_CACHE_TTL = 60  # 进程内缓存有效期（秒）
+LOCAL_SESSION_CACHE_MAXSIZE = 10000
+
+_local_session_cache = {}
+_local_session_cache_lock = threading.Lock()
+_session_redis = None
+
+def _get_session_redis():
+    """获取用于会话缓存的Redis连接，未启用Redis时返回None"""
+    global _session_redis
+    if not Config.REDIS_ENABLED:
+        return None
+    if _session_redis is None:
+        try:
+            import redis
+            _session_redis = redis.Redis(
+                host=Config.REDIS_HOST,
+                port=Config.REDIS_PORT,
+                password=Config.REDIS_PASSWORD,
+                db=Config.REDIS_DB,
+                decode_responses=True
+            )
+        except Exception:
+            return None
+    return _session_redis
+
+def _session_cache_key(session_id):
+    return f"sess:{session_id}"
+
+def _get_cached_session(session_id):
+    """从缓存获取会话，返回(user_id, 过期时间戳)或None"""
+    redis_client = _get_session_redis()
+    if redis_client is not None:
+        try:
+            cached = redis_client.get(_session_cache_key(session_id))
+            if cached:
+                user_id, expires_at = cached.split(':', 1)
+                return int(user_id), float(expires_at)
+            return None
+        except Exception:
+            pass
+
+    with _local_session_cache_lock:
+        entry = _local_session_cache.get(session_id)
+        if entry is None:
+            return None
+        user_id, expires_at, cached_at = entry
+        if time.time() - cached_at >= LOCAL_SESSION_CACHE_TTL:
+            del _local_session_cache[session_id]
+            return None
+        return user_id, expires_at
+
+def _set_cached_session(session_id, user_id, expires_at):
+    """缓存会话验证结果"""
+    expires_epoch = expires_at.timestamp()
+    ttl = int(min(expires_epoch - time.time(), SESSION_CACHE_TTL))
+    if ttl <= 0:
+        return
+
+    redis_client = _get_session_redis()
+    if redis_client is not None:
+        try:
+            redis_client.setex(_session_cache_key(session_id), ttl, f"{user_id}:{expires_epoch}")
+            return
+        except Exception:
+            pass
+
+    with _local_session_cache_lock:
+        if len(_local_session_cache) >= LOCAL_SESSION_CACHE_MAXSIZE:
+            # 淘汰最早写入的条目
+            _local_session_cache.pop(next(iter(_local_session_cache)))
+        _local_session_cache[session_id] = (user_id, expires_epoch, time.time())
+
+def _delete_cached_session(session_id):
+    """使会话缓存失效"""
+    redis_client = _get_session_redis()
+    if redis_client is not None:
+        try:
+            redis_client.delete(_session_cache_key(session_id))
+        except Exception:
+            pass
+
+    with _local_session_cache_lock:
+        _local_session_cache.pop(session_id, None)
+
+# 会话批量写入：create_session 将新会话登记为待写入，由后台线程每50ms批量插入
+SESSION_FLUSH_INTERVAL = 0.05
+# 批量写入失败后的重试次数上限，超过后放弃并让对应会话立即失效
+SESSION_FLUSH_MAX_ATTEMPTS = 3
+
+# 待写入的会话：session_id -> [会话字段, 已尝试写入次数]，写入成功后才移除
+_pending_sessions = {}
+_pending_sessions_lock = threading.Lock()
+# 只用于唤醒后台线程，内容无意义
+_session_queue = queue.Queue()
+_session_flush_thread = None
+_session_flush_lock = threading.Lock()
+# 同一时间只允许一次写入过程
+_session_write_lock = threading.Lock()
+
+def _session_logger():
+    import logging
+    return logging.getLogger('ai_answer_service')
+
+def _drain_session_queue():
+    while True:
+        try:
+            _session_queue.get_nowait()
+        except queue.Empty:
+            return
+
+def _write_sessions(db, pending):
+    """写入待写入的会话，返回写入成功的 session_id 列表
+
+    先整批插入；整批失败时逐条重试，只有自身写入失败的会话才计入失败
+    """
+    try:
+        db.bulk_insert_mappings(UserSession, list(pending.values()))
+        db.commit()
+        return list(pending)
+    except Exception as e:
+        db.rollback()
+        if len(pending) == 1:
+            _session_logger().error(f"写入用户会话失败: {str(e)}")
+            return []
+        _session_logger().error(f"批量写入用户会话失败({len(pending)}条)，改为逐条写入: {str(e)}")
+
+    written = []
+    for session_id, row in pending.items():
+        try:
+            db.bulk_insert_mappings(UserSession, [row])
+            db.commit()
+            written.append(session_id)
+        except Exception as e:
+            db.rollback()
+            _session_logger().error(f"写入用户会话失败(user_id={row['user_id']}): {str(e)}")
+    return written
+
+def _flush_pending_sessions():
+    """写入待写入的会话，返回是否仍有会话等待重试"""
+    # 后台线程与退出时的 atexit 可能同时执行，串行化以免同一批会话被插入两次
+    with _session_write_lock:
+        with _pending_sessions_lock:
+            pending = {session_id: entry[0] for session_id, entry in _pending_sessions.items()}
+        if not pending:
+            return False
+
+        db = get_db_session()
+        try:
+            if db is None:
+                _session_logger().error(f"无法获取数据库会话，{len(pending)}条用户会话等待重试")
+                written = []
+            else:
+                written = _write_sessions(db, pending)
+
+            written_set = set(written)
+            dropped = []
+            with _pending_sessions_lock:
+                # 写入期间被 delete_session 移除的会话已经登出，需要补删刚插入的行
+                revoked = [session_id for session_id in written if session_id not in _pending_sessions]
+                for session_id in pending:
+                    if session_id in written_set:
+                        _pending_sessions.pop(session_id, None)
+                        continue
+                    entry = _pending_sessions.get(session_id)
+                    if entry is None:
+                        continue
+                    entry[1] += 1
+                    if entry[1] >= SESSION_FLUSH_MAX_ATTEMPTS:
+                        del _pending_sessions[session_id]
+                        dropped.append(session_id)
+                retry = bool(_pending_sessions)
+
+            if dropped:
+                # 放弃写入的会话立即失效，而不是等缓存过期后才被登出
+                _session_logger().error(f"放弃写入{len(dropped)}条用户会话，相关用户需要重新登录")
+                for session_id in dropped:
+                    _delete_cached_session(session_id)
+
+            if revoked:
+                try:
+                    db.query(UserSession).filter(UserSession.session_id.in_(revoked)).delete(synchronize_session=False)
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    _session_logger().error(f"删除已登出的用户会话失败: {str(e)}")
+            return retry
+        finally:
+            close_db_session(db)
+
+def _session_flush_loop():
+    while True:
+        # 阻塞等待第一条会话，再等待一个批次间隔收集同一批次的其他会话
+        _session_queue.get()
+        time.sleep(SESSION_FLUSH_INTERVAL)
+        _drain_session_queue()
+        if _flush_pending_sessions():
+            # 写入失败，退避后重试
+            time.sleep(SESSION_FLUSH_INTERVAL * 10)
+            _session_queue.put(None)
+
+def _ensure_session_flusher():
+    global _session_flush_thread
+    with _session_flush_lock:
+        if _session_flush_thread is None or not _session_flush_thread.is_alive():
+            _session_flush_thread = threading.Thread(target=_session_flush_loop, daemon=True)
+            _session_flush_thread.start()
+
+@atexit.register
+def _flush_sessions_at_exit():
+    _flush_pending_sessions()
+
 # 用户会话模型
 class UserSession(Base):
     __tablename__ = 'user_sessions'
@@ -139,25 +422,52 @@ class UserSession(Base):
     expires_at = Column(DateTime, nullable=False, comment='过期时间')
 
     @classmethod
-    def create_session(cls, db, user_id, ip_address=None, user_agent=None, expires_days=30):
-        """创建新会话"""
+    def create_session(cls, db, user_id, ip_address=None, user_agent=None, expires_days=30, sync=False):
+        """创建新会话
+
+        默认将会话登记为待写入，由后台线程在约50ms内批量写入数据库，并立即返回会话ID；
+        此时不使用 db 参数，写入失败会重试，多次失败后会话失效。
+        需要确保返回时已写入数据库的场景传入 sync=True，由 db 同步提交。
+        """
         # 生成唯一会话ID
-        session_id = uuid.uuid4().hex
+        session_id = secrets.token_hex(16)
         # 计算过期时间
-        expires_at = datetime.now() + timedelta(days=expires_days)
-
-        # 创建会话记录
-        session = cls(
-            user_id=user_id,
-            session_id=session_id,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            expires_at=expires_at
-        )
-
-        # 保存到数据库
-        db.add(session)
-        db.commit()
+        now = datetime.now()
+        expires_at = now + timedelta(days=expires_days)
+        # 截断到列宽，严格模式下超长的 User-Agent 会导致整条会话写入失败
+        if ip_address:
+            ip_address = ip_address[:cls.__table__.c.ip_address.type.length]
+        if user_agent:
+            user_agent = user_agent[:cls.__table__.c.user_agent.type.length]
+
+        if sync:
+            # 创建会话记录
+            session = cls(
+                user_id=user_id,
+                session_id=session_id,
+                ip_address=ip_address,
+                user_agent=user_agent,
+                expires_at=expires_at
+            )
+
+            # 保存到数据库
+            db.add(session)
+            db.commit()
+            return session_id
+
+        # 先写入缓存，保证会话在落库前也能通过验证
+        _set_cached_session(session_id, user_id, expires_at)
+        with _pending_sessions_lock:
+            _pending_sessions[session_id] = [{
+                'user_id': user_id,
+                'session_id': session_id,
+                'ip_address': ip_address,
+                'user_agent': user_agent,
+                'created_at': now,
+                'expires_at': expires_at
+            }, 0]
+        _session_queue.put(None)
+        _ensure_session_flusher()
 
         return session_id
 
@@ -167,6 +477,13 @@ class UserSession(Base):
         if not session_id:
             return None
 
+        # 优先从缓存获取
+        cached = _get_cached_session(session_id)
+        if cached is not None:
+            user_id, expires_at = cached
+            if expires_at > time.time():
+                return user_id
+
         # 查询会话
         session = db.query(cls).filter(
             cls.session_id == session_id,
@@ -176,17 +493,22 @@ class UserSession(Base):
         if not session:
             return None
 
+        _set_cached_session(session_id, session.user_id, session.expires_at)
         return session.user_id
 
     @classmethod
     def delete_session(cls, db, session_id):
         """删除会话"""
+        # 尚未落库的会话直接从待写入列表移除；正在写入的由后台线程写入后补删
+        with _pending_sessions_lock:
+            was_pending = _pending_sessions.pop(session_id, None) is not None
+        _delete_cached_session(session_id)
         session = db.query(cls).filter(cls.session_id == session_id).first()
         if session:
             db.delete(session)
             db.commit()
             return True
-        return False
+        return was_pending
 
 # 用户认证函数
 def authenticate_user(db, username, password):
@@ -196,13 +518,17 @@ def authenticate_user(db, username, password):
 
     # 验证密码
     if user and user.verify_password(password):
+        # 旧版sha256哈希在登录成功后升级为scrypt
+        if user.needs_rehash():
+            user.set_password(password)
+            db.commit()
         return user
 
     return None
 
 def get_user_by_id(db, user_id):
     """根据ID获取用户"""
-    return db.query(User).filter(User.id == user_id).first()
+    return db.get(User, user_id)
 
 def create_user(db, username, password, email=None, role='user', is_admin=False):
     """创建新用户"""
@@ -235,11 +561,18 @@ def create_user(db, username, password, email=None, role='user', is_admin=False)
 def init_db():
     """初始化数据库连接"""
     try:
-        engine = create_engine(Config.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True, pool_recycle=3600)
+        engine = create_engine(
+            Config.SQLALCHEMY_DATABASE_URI,
+            pool_pre_ping=True,
+            pool_recycle=Config.DB_POOL_RECYCLE,
+            pool_size=Config.DB_POOL_SIZE,
+            max_overflow=Config.DB_MAX_OVERFLOW,
+            pool_timeout=Config.DB_POOL_TIMEOUT
+        )
         # 创建表
         Base.metadata.create_all(engine)
-        # 创建会话工厂
-        return sessionmaker(bind=engine)
+        # 创建线程本地的会话工厂，每个线程（请求）拿到独立的会话
+        return scoped_session(sessionmaker(bind=engine))
     except Exception as e:
         import logging
         logging.getLogger('ai_answer_service').error(f"初始化数据库时出错: {str(e)}")
@@ -247,16 +580,21 @@ def init_db():
 
 # 会话工厂
 Session = None
+# 保护会话工厂的首次创建，避免并发的首批请求各自建一个引擎和连接池
+_session_init_lock = threading.Lock()
 
 def get_db_session():
     """获取数据库会话
 
-    注意：每次调用都会返回一个新的会话实例。使用后需要手动关闭或在请求结束时自动关闭。
+    注意：同一线程内的多次调用返回同一个会话实例（scoped_session）。
+    使用后需要手动关闭或在请求结束时自动关闭。
     """
     global Session
     try:
         if Session is None:
-            Session = init_db()
+            with _session_init_lock:
+                if Session is None:
+                    Session = init_db()
         return Session()
     except Exception as e:
         import logging
@@ -279,8 +617,10 @@ def close_db_session(session):
                 import logging
                 logging.getLogger('ai_answer_service').warning(f"回滚事务时出错: {str(rollback_error)}")
 
-            # 关闭会话
+            # 关闭会话，并从线程本地注册表中移除
             session.close()
+            if Session is not None:
+                Session.remove()
         except Exception as e:
             import logging
             logging.getLogger('ai_answer_service').error(f"关闭数据库会话时出错: {str(e)}")
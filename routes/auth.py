@@ -1,11 +1,9 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, make_response
+from flask import Blueprint, render_template, request, redirect, url_for, session, make_response, g
 from datetime import datetime
-from models import get_db_session, authenticate_user, create_user, UserSession
+from models import authenticate_user, create_user, UserSession
 
 auth_bp = Blueprint('auth', __name__)
 
-db = get_db_session()
-
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
     current_year = datetime.now().year
@@ -26,6 +24,7 @@ def register():
         elif password != confirm_password:
             error = "两次输入的密码不一致"
         else:
+            db = g.db
             user, err = create_user(db, username, password, email)
             if user:
                 session['user_id'] = user.id
@@ -53,6 +52,7 @@ def login():
         username = request.form.get('username', '').strip()
         password = request.form.get('password', '')
         remember = request.form.get('remember', '') == 'on'
+        db = g.db
         user = authenticate_user(db, username, password)
         if user:
             session['user_id'] = user.id
@@ -78,7 +78,7 @@ def login():
 def logout():
     session_id = request.cookies.get('session_id')
     if session_id:
-        UserSession.delete_session(db, session_id)
+        UserSession.delete_session(g.db, session_id)
     session.clear()
     response = make_response(redirect(url_for('auth.login')))
     response.delete_cookie('session_id')
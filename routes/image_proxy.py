@@ -1,18 +1,112 @@
 import requests
-from flask import Blueprint, request, Response, current_app
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import Blueprint, request, Response, current_app, send_file
+from werkzeug.wsgi import wrap_file
 import re
-from urllib.parse import urlparse
+import os
+import time
+import socket
+import ipaddress
+import functools
+import hashlib
+import tempfile
+import threading
+from urllib.parse import urlparse, urljoin
 import logging
 
+logger = logging.getLogger(__name__)
+
 # 创建蓝图
 image_proxy_bp = Blueprint('image_proxy', __name__)
 
+# 转发图片时每次读取的块大小
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# 上游超时（连接超时, 读取超时），连接阶段快速失败以尽快释放工作线程
+UPSTREAM_TIMEOUT = (3, 10)
+
+# 复用到图片服务器的连接，避免每次请求都重新进行TCP/TLS握手
+_SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    # 连接失败不重试，否则不可达的主机会把工作线程占用数倍的连接超时
+    max_retries=Retry(total=2, connect=0, backoff_factor=0.1)
+)
+_SESSION.mount('https://', _adapter)
+_SESSION.mount('http://', _adapter)
+
+# 图片本地磁盘缓存配置
+IMAGE_CACHE_DIR = os.path.join('cache', 'images')
+IMAGE_CACHE_TTL = 86400  # 与下游Cache-Control保持一致，缓存24小时
+IMAGE_CACHE_SIZE_LIMIT = 1 << 30  # 缓存目录总大小上限（1GB）
+IMAGE_CACHE_PRUNE_INTERVAL = 100  # 每写入多少张图片清理一次缓存目录
+
+_image_cache_writes = 0
+_image_cache_lock = threading.Lock()
+
 # 允许的域名列表
 ALLOWED_DOMAINS = [
     'p.ananas.chaoxing.com',
     'chaoxing.com',
     'image.chaoxing.com'
 ]
+_ALLOWED_DOMAINS = frozenset(ALLOWED_DOMAINS)
+
+# DNS解析结果缓存时长（秒）
+DNS_CACHE_TTL = 60
+
+# 手动跟随上游重定向的最大次数，每一跳都重新做域名和地址校验
+MAX_REDIRECTS = 3
+
+@functools.lru_cache(maxsize=1024)
+def _resolve_host(host, ttl_bucket):
+    """解析域名为IP地址列表，ttl_bucket用于让缓存按时间段失效"""
+    return tuple({info[4][0] for info in socket.getaddrinfo(host, None)})
+
+def is_public_address(address):
+    """IP地址不是内网/回环/链路本地/保留/组播地址时返回True"""
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    return not (ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved or ip.is_multicast)
+
+def is_public_host(host):
+    """域名解析出的所有地址都不是内网/回环/链路本地地址时返回True"""
+    try:
+        addresses = _resolve_host(host, int(time.time() // DNS_CACHE_TTL))
+    except (socket.gaierror, UnicodeError):
+        return False
+    return bool(addresses) and all(is_public_address(address) for address in addresses)
+
+def is_allowed_domain(host):
+    """检查域名本身或其任一上级域名是否在允许列表中"""
+    labels = host.lower().split('.')
+    return any('.'.join(labels[i:]) in _ALLOWED_DOMAINS for i in range(len(labels)))
+
+def check_target_url(url):
+    """校验待请求的URL，通过时返回None，否则返回 (状态码, 错误信息)"""
+    parsed_url = urlparse(url)
+    domain = parsed_url.netloc
+
+    if parsed_url.scheme not in ('http', 'https'):
+        return 400, "Unsupported URL scheme"
+
+    # 防止递归代理
+    if parsed_url.path.startswith('/api/image/proxy'):
+        logger.error(f"Recursive proxy detected: {url}")
+        return 400, "Recursive proxy request detected"
+
+    # 检查是否是允许的域名
+    if not is_allowed_domain(parsed_url.hostname or ''):
+        logger.warning(f"Domain not allowed: {domain}")
+        return 403, f"Domain not allowed: {domain}"
+
+    # 拒绝解析到内网地址的域名，防止SSRF
+    if not is_public_host(parsed_url.hostname):
+        logger.warning(f"Domain resolves to a non-public address: {domain}")
+        return 403, f"Domain not allowed: {domain}"
+
+    return None
 
 # 超星平台请求头
 CHAOXING_HEADERS = {
@@ -48,6 +142,159 @@ CHAOXING_COOKIES = {
     "jrose": "FCDA479AF7694F936718A24B59D4BED6.fms-2697320765-x47v4"
 }
 
+def _connected_to_public_address(response, url):
+    """校验实际建立连接的对端地址，防止校验后DNS结果被篡改（DNS rebinding）
+
+    经由代理访问或取不到底层socket时无法判断，视为通过
+    """
+    if requests.utils.get_environ_proxies(url):
+        return True
+    connection = getattr(response.raw, '_connection', None)
+    sock = getattr(connection, 'sock', None)
+    if sock is None:
+        return True
+    try:
+        address = sock.getpeername()[0]
+    except OSError:
+        return True
+    return is_public_address(address)
+
+class UpstreamRejected(Exception):
+    """上游重定向或连接目标未通过安全校验"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def fetch_upstream(url):
+    """请求上游图片，手动跟随重定向并逐跳校验目标地址，返回流式响应"""
+    for _ in range(MAX_REDIRECTS + 1):
+        response = _SESSION.get(
+            url,
+            headers=CHAOXING_HEADERS,
+            cookies=CHAOXING_COOKIES,
+            stream=True,
+            timeout=UPSTREAM_TIMEOUT,
+            allow_redirects=False
+        )
+        if not _connected_to_public_address(response, url):
+            response.close()
+            raise UpstreamRejected(403, f"Domain not allowed: {urlparse(url).netloc}")
+        if not response.is_redirect:
+            return response
+
+        location = urljoin(url, response.headers['location'])
+        response.close()
+        rejected = check_target_url(location)
+        if rejected:
+            raise UpstreamRejected(*rejected)
+        url = location
+    raise requests.exceptions.TooManyRedirects(f"Exceeded {MAX_REDIRECTS} redirects")
+
+def _image_cache_paths(url):
+    """根据URL哈希获取缓存的数据文件和类型文件路径"""
+    key = hashlib.blake2b(url.encode('utf-8'), digest_size=16).hexdigest()
+    data_path = os.path.join(IMAGE_CACHE_DIR, key)
+    return data_path, data_path + '.type'
+
+def _load_cached_image(url):
+    """读取缓存，命中返回(数据文件路径, content-type)，否则返回None"""
+    data_path, type_path = _image_cache_paths(url)
+    try:
+        if time.time() - os.path.getmtime(data_path) > IMAGE_CACHE_TTL:
+            return None
+        with open(type_path, 'r', encoding='utf-8') as f:
+            content_type = f.read().strip()
+        return data_path, content_type or None
+    except OSError:
+        return None
+
+def _remove_cache_entry(data_path):
+    for path in (data_path, data_path + '.type'):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _prune_image_cache():
+    """删除过期的缓存，并在超出总大小上限时从最旧的开始删除"""
+    now = time.time()
+    entries = []
+    total_size = 0
+    with os.scandir(IMAGE_CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(('.type', '.tmp')):
+                continue
+            stat = entry.stat()
+            if now - stat.st_mtime > IMAGE_CACHE_TTL:
+                _remove_cache_entry(entry.path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total_size <= IMAGE_CACHE_SIZE_LIMIT:
+            break
+        _remove_cache_entry(path)
+        total_size -= size
+
+def _after_cache_write():
+    global _image_cache_writes
+    with _image_cache_lock:
+        _image_cache_writes += 1
+        should_prune = _image_cache_writes % IMAGE_CACHE_PRUNE_INTERVAL == 0
+    if should_prune:
+        try:
+            _prune_image_cache()
+        except Exception as e:
+            logger.warning(f"Failed to prune image cache: {str(e)}")
+
+def _stream_and_cache(response, url, content_type):
+    """边向客户端转发边写入临时文件，完整读取后原子替换到缓存目录"""
+    data_path, type_path = _image_cache_paths(url)
+    tmp_path = None
+    tmp_file = None
+    try:
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=IMAGE_CACHE_DIR, suffix='.tmp')
+        tmp_file = os.fdopen(fd, 'wb')
+    except OSError as e:
+        logger.warning(f"Image cache unavailable: {str(e)}")
+
+    completed = False
+    try:
+        while True:
+            chunk = response.raw.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            if tmp_file is not None:
+                tmp_file.write(chunk)
+            yield chunk
+
+        if tmp_file is not None:
+            tmp_file.close()
+            with open(type_path, 'w', encoding='utf-8') as f:
+                f.write(content_type or '')
+            os.replace(tmp_path, data_path)
+            completed = True
+            _after_cache_write()
+    finally:
+        response.close()
+        if tmp_file is not None and not completed:
+            tmp_file.close()
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+def _add_proxy_headers(proxy_response):
+    """设置代理响应的通用响应头"""
+    proxy_response.headers['Cache-Control'] = 'public, max-age=86400'  # 缓存24小时
+    proxy_response.headers['Access-Control-Allow-Origin'] = '*'  # 允许跨域
+    proxy_response.headers['Referrer-Policy'] = 'strict-origin-when-cross-origin'  # 设置引用策略
+    return proxy_response
+
 @image_proxy_bp.route('/proxy', methods=['GET'])
 def proxy_image():
     """
@@ -59,64 +306,72 @@ def proxy_image():
     if not url:
         return Response("Missing URL parameter", status=400)
     
-    # 防止递归代理
-    if '/api/image/proxy' in url:
-        current_app.logger.error(f"Recursive proxy detected: {url}")
-        return Response("Recursive proxy request detected", status=400)
-        
-    # 检查URL安全性
-    parsed_url = urlparse(url)
-    domain = parsed_url.netloc
-    
     # 记录请求信息
-    current_app.logger.info(f"Processing image proxy request for: {url} from domain: {domain}")
-    
-    # 检查是否是允许的域名
-    if not any(domain.endswith(allowed_domain) for allowed_domain in ALLOWED_DOMAINS):
-        current_app.logger.warning(f"Domain not allowed: {domain}")
-        return Response(f"Domain not allowed: {domain}", status=403)
+    current_app.logger.info(f"Processing image proxy request for: {url} from domain: {urlparse(url).netloc}")
+
+    # 检查URL安全性
+    rejected = check_target_url(url)
+    if rejected:
+        status, message = rejected
+        return Response(message, status=status)
     
+    # 优先使用本地缓存
+    cached = _load_cached_image(url)
+    if cached:
+        data_path, content_type = cached
+        current_app.logger.info(f"Serving image from cache for: {url}")
+        return _add_proxy_headers(send_file(data_path, mimetype=content_type or 'application/octet-stream'))
+
     try:
         # 记录请求详情
         current_app.logger.info(f"Sending request to: {url} with headers: {CHAOXING_HEADERS}")
         
         # 发送请求获取图片
-        # 发送请求获取图片
-        response = requests.get(
-            url, 
-            headers=CHAOXING_HEADERS,
-            cookies=CHAOXING_COOKIES,
-            stream=True,
-            timeout=10
-        )
+        response = fetch_upstream(url)
         
         # 检查响应状态
         if response.status_code != 200:
             current_app.logger.error(f"Proxy error: {response.status_code} for URL {url}")
             current_app.logger.error(f"Response headers: {response.headers}")
+            # 不读取响应体，及时关闭以释放连接
+            response.close()
             return Response(f"Error fetching image: {response.status_code}", status=response.status_code)
         
         # 记录成功响应
         current_app.logger.info(f"Successfully fetched image from {url}, content-type: {response.headers.get('content-type')}")
         
-        # 创建响应对象
+        # 上游内容经过压缩时会被解压转发，此时原Content-Length不再准确
+        upstream_encoded = bool(response.headers.get('content-encoding'))
+        response.raw.decode_content = True
+
+        # 上游明确禁止缓存时直接透传，否则边转发边写入本地缓存
+        if 'no-store' in response.headers.get('cache-control', '').lower():
+            body = wrap_file(request.environ, response.raw, STREAM_CHUNK_SIZE)
+        else:
+            body = _stream_and_cache(response, url, response.headers.get('content-type'))
+
+        # 创建响应对象，交由WSGI服务器分块发送
         proxy_response = Response(
-            response.iter_content(chunk_size=1024),
-            status=response.status_code
+            body,
+            status=response.status_code,
+            direct_passthrough=True
         )
         
         # 设置响应头
         for key, value in response.headers.items():
-            if key.lower() not in ['content-encoding', 'content-length', 'transfer-encoding', 'connection']:
-                proxy_response.headers[key] = value
+            key_lower = key.lower()
+            if key_lower in ['content-encoding', 'transfer-encoding', 'connection']:
+                continue
+            if key_lower == 'content-length' and upstream_encoded:
+                continue
+            proxy_response.headers[key] = value
         
         # 设置缓存控制
-        proxy_response.headers['Cache-Control'] = 'public, max-age=86400'  # 缓存24小时
-        proxy_response.headers['Access-Control-Allow-Origin'] = '*'  # 允许跨域
-        proxy_response.headers['Referrer-Policy'] = 'strict-origin-when-cross-origin'  # 设置引用策略
-        
-        return proxy_response
+        return _add_proxy_headers(proxy_response)
         
+    except UpstreamRejected as e:
+        current_app.logger.warning(f"Upstream target rejected for URL {url}: {e.message}")
+        return Response(e.message, status=e.status)
     except requests.exceptions.Timeout:
         current_app.logger.error(f"Timeout error for URL {url}")
         return Response("Request timed out while fetching image", status=504)
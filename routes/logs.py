@@ -1,51 +1,100 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, jsonify
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 import os
-import glob
+import time
+import traceback
 from utils.logger import Logger
-from config import Config
+from config.api_proxy_pool import get_api_proxy_pool
 from utils import login_required, admin_required
 
 logs_bp = Blueprint('logs', __name__)
 
-@logs_bp.route('/logs', methods=['GET'])
-@login_required
-@admin_required
-def logs_panel():
-    current_year = datetime.now().year
-    log_content = Logger.get_latest_logs(max_lines=2000)
-    uptime_seconds = 0  # 可根据实际需要传递
+# 清空日志文件的后台线程池，避免大量文件操作长时间占用请求线程
+_clear_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='log-clear')
+# 清空日志接口等待后台任务完成的最长时间（秒）
+CLEAR_WAIT_TIMEOUT = 0.5
+
+def format_uptime(uptime_seconds):
+    """将运行秒数格式化为 X天X小时X分钟"""
     days = int(uptime_seconds // 86400)
     hours = int((uptime_seconds % 86400) // 3600)
     minutes = int((uptime_seconds % 3600) // 60)
-    uptime_str = f"{days}天{hours}小时{minutes}分钟"
-    # 获取当前使用的代理信息
+    return f"{days}天{hours}小时{minutes}分钟"
+
+_ZERO_UPTIME = format_uptime(0)
+
+# 当前年份缓存，跨年后第一次请求时刷新
+_year_cache = {'year': None, 'expires': 0.0}
+
+def _current_year():
+    if time.time() >= _year_cache['expires']:
+        now = datetime.now()
+        _year_cache['year'] = now.year
+        _year_cache['expires'] = datetime(now.year + 1, 1, 1).timestamp()
+    return _year_cache['year']
+
+# 当前模型名称缓存，代理池配置可能热重载，最多缓存 MODEL_CACHE_TTL 秒
+MODEL_CACHE_TTL = 30
+_model_cache = {'model': None, 'expires': 0.0}
+
+def _current_model():
+    """获取当前使用的代理模型名称"""
+    now = time.monotonic()
+    if now < _model_cache['expires']:
+        return _model_cache['model']
     try:
-        from config.api_proxy_pool import get_api_proxy_pool
-        proxy_pool = get_api_proxy_pool()
-        primary_proxy = proxy_pool.get_primary_proxy()
+        primary_proxy = get_api_proxy_pool().get_primary_proxy()
         current_model = primary_proxy.model if primary_proxy else "未配置代理"
     except Exception:
         current_model = "代理池未初始化"
+    _model_cache['model'] = current_model
+    _model_cache['expires'] = now + MODEL_CACHE_TTL
+    return current_model
+
+@logs_bp.route('/logs', methods=['GET'])
+@login_required
+@admin_required
+def logs_panel():
+    log_content = Logger.get_latest_logs(max_lines=2000)
+    uptime_seconds = 0  # 可根据实际需要传递
+    uptime_str = format_uptime(uptime_seconds) if uptime_seconds > 0 else _ZERO_UPTIME
+    current_model = _current_model()
 
-    if request.args.get('ajax'):
-        return render_template(
-            'logs.html',
-            version="2.0.0",
-            log_content=log_content,
-            model=current_model,
-            uptime=uptime_str,
-            current_year=current_year
-        )
     return render_template(
         'logs.html',
         version="2.0.0",
         log_content=log_content,
         model=current_model,
         uptime=uptime_str,
-        current_year=current_year
+        current_year=_current_year()
     )
 
+def _clear_log_file(log_file, marker):
+    """清空单个日志文件并写入清空标记，成功返回None，失败返回错误信息"""
+    try:
+        # 方法1: 直接截断文件，再追加清空标记
+        os.truncate(log_file, 0)
+        fd = os.open(log_file, os.O_WRONLY | os.O_APPEND)
+        try:
+            os.write(fd, marker)
+        finally:
+            os.close(fd)
+        return None
+    except OSError as e1:
+        try:
+            # 方法2: 尝试删除并重新创建文件
+            os.remove(log_file)
+            fd = os.open(log_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.write(fd, marker)
+            finally:
+                os.close(fd)
+            return None
+        except OSError as e2:
+            # 两种方法都失败
+            return f"{str(e1)} | {str(e2)}"
+
 @logs_bp.route('/api/logs/clear', methods=['POST'])
 @login_required
 @admin_required
@@ -59,8 +108,9 @@ def clear_logs():
             return jsonify({"success": True, "message": "创建了日志目录，但没有日志文件需要清空"})
 
         # 获取所有日志文件
-        log_files = glob.glob(os.path.join(log_dir, "*.log"))
-        log_files.extend(glob.glob(os.path.join(log_dir, "*.log.*")))
+        with os.scandir(log_dir) as entries:
+            log_files = [e.path for e in entries
+                         if e.is_file() and (e.name.endswith('.log') or '.log.' in e.name)]
 
         if not log_files:
             return jsonify({"success": False, "message": "未找到日志文件"})
@@ -69,43 +119,26 @@ def clear_logs():
         cleared_files = []
         failed_files = []
         error_messages = []
+        marker = f"--- 日志已清空 {datetime.now():%Y-%m-%d %H:%M:%S} ---\n".encode('utf-8')
 
-        for log_file in log_files:
-            try:
-                # 尝试关闭可能打开的文件句柄
-                try:
-                    import psutil
-                    for proc in psutil.process_iter(['pid', 'open_files']):
-                        try:
-                            for file in proc.info['open_files'] or []:
-                                if file.path == os.path.abspath(log_file):
-                                    print(f"文件 {log_file} 被进程 {proc.pid} 占用，尝试其他方法")
-                        except (psutil.NoSuchProcess, psutil.AccessDenied):
-                            pass
-                except ImportError:
-                    print("psutil模块不可用，跳过进程检查")
-
-                # 尝试使用低级文件操作
-                try:
-                    # 方法1: 使用truncate清空文件
-                    with open(log_file, 'r+', encoding='utf-8') as f:
-                        f.truncate(0)
-                        f.write(f"--- 日志已清空 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n")
-                    cleared_files.append(log_file)
-                except Exception as e1:
-                    try:
-                        # 方法2: 尝试删除并重新创建文件
-                        os.remove(log_file)
-                        with open(log_file, 'w', encoding='utf-8') as f:
-                            f.write(f"--- 日志已清空 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n")
-                        cleared_files.append(log_file)
-                    except Exception as e2:
-                        # 两种方法都失败
-                        failed_files.append(log_file)
-                        error_messages.append(f"{log_file}: {str(e1)} | {str(e2)}")
-            except Exception as e:
+        futures = {_clear_pool.submit(_clear_log_file, log_file, marker): log_file for log_file in log_files}
+        done, pending = wait(futures, timeout=CLEAR_WAIT_TIMEOUT)
+        for future in done:
+            log_file = futures[future]
+            error = future.exception() or future.result()
+            if error:
                 failed_files.append(log_file)
-                error_messages.append(f"{log_file}: {str(e)}")
+                error_messages.append(f"{log_file}: {str(error)}")
+            else:
+                cleared_files.append(log_file)
+
+        # 超过等待时间仍未完成的文件继续在后台清空
+        if pending:
+            return jsonify({
+                "success": True,
+                "message": f"已清空 {len(cleared_files)} 个文件，{len(pending)} 个文件正在后台清空",
+                "details": error_messages
+            })
 
         # 根据结果返回相应的消息
         if cleared_files and not failed_files:
@@ -126,7 +159,6 @@ def clear_logs():
                 "details": error_messages
             }), 500
     except Exception as e:
-        import traceback
         error_details = traceback.format_exc()
         return jsonify({
             "success": False,
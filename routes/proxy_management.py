@@ -6,20 +6,61 @@
 """
 
 from flask import Blueprint, request, jsonify
-import json
+import asyncio
+import hashlib
+import re
+import ssl
+import aiohttp
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import threading
 from datetime import datetime
-from utils import login_required, admin_required
+from urllib.parse import urlparse
+from utils import login_required, admin_required, clear_response_cache
 from utils.logger import app_logger as logger
 from config.api_proxy_pool import get_api_proxy_pool
+from routes.settings import load_config, save_config, config_write_lock
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 proxy_management_bp = Blueprint('proxy_management', __name__)
 
-# 全局变量用于健康检查
+# 测试代理/发现模型的超时（连接超时, 读取超时），连接阶段快速失败
+PROXY_TEST_TIMEOUT = (3, 10)
+DISCOVER_MODELS_TIMEOUT = (3, 15)
+
+# 代理地址常为自签名证书，探测时不校验证书；只在启动时关闭一次告警并构建一次SSL上下文
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+_PROBE_SSL_CONTEXT = ssl.create_default_context()
+_PROBE_SSL_CONTEXT.check_hostname = False
+_PROBE_SSL_CONTEXT.verify_mode = ssl.CERT_NONE
+
+class _ProbeHTTPAdapter(HTTPAdapter):
+    """所有连接共用同一个SSL上下文，避免每个连接重新创建"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = _PROBE_SSL_CONTEXT
+        return super().init_poolmanager(*args, **kwargs)
+
+# 复用到各代理的连接，避免每次测试都重新进行TCP/TLS握手
+_http_session = requests.Session()
+_http_session.verify = False
+_adapter = _ProbeHTTPAdapter(
+    pool_connections=64,
+    pool_maxsize=64,
+    max_retries=Retry(total=2, backoff_factor=0.3)
+)
+_http_session.mount('https://', _adapter)
+_http_session.mount('http://', _adapter)
+
+# 最近一轮健康检查的结果快照，每轮结束后整体替换，发布后不再修改，读取时无需加锁
 health_check_results = {}
-health_check_lock = threading.Lock()
 
 @proxy_management_bp.route('/api/proxy/add', methods=['POST'])
 @login_required
@@ -52,40 +93,40 @@ def add_proxy():
                 'message': 'models必须是非空数组'
             }), 400
 
-        # 读取当前配置
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        with config_write_lock():
+            # 读取当前配置
+            config = load_config()
 
-        # 检查代理名称是否已存在
-        existing_names = [proxy['name'] for proxy in config.get('third_party_apis', [])]
-        if data['name'] in existing_names:
-            return jsonify({
-                'success': False,
-                'message': f'代理名称 "{data["name"]}" 已存在'
-            }), 400
+            # 检查代理名称是否已存在
+            apis = config.setdefault('third_party_apis', [])
+            existing_names = {proxy['name'] for proxy in apis}
+            if data['name'] in existing_names:
+                return jsonify({
+                    'success': False,
+                    'message': f'代理名称 "{data["name"]}" 已存在'
+                }), 400
 
-        # 构建新代理配置
-        new_proxy = {
-            'name': data['name'],
-            'api_base': data['api_base'].rstrip('/'),
-            'api_keys': data['api_keys'],
-            'model': data['model'],
-            'models': data['models'],
-            'is_active': data.get('is_active', True),
-            'priority': data.get('priority', len(config.get('third_party_apis', [])) + 1)
-        }
+            # 构建新代理配置
+            new_proxy = {
+                'name': data['name'],
+                'api_base': data['api_base'].rstrip('/'),
+                'api_keys': data['api_keys'],
+                'model': data['model'],
+                'models': data['models'],
+                'is_active': data.get('is_active', True),
+                'priority': data.get('priority', len(apis) + 1)
+            }
 
-        # 添加到配置
-        if 'third_party_apis' not in config:
-            config['third_party_apis'] = []
-        config['third_party_apis'].append(new_proxy)
+            # 添加到配置
+            apis.append(new_proxy)
 
-        # 保存配置
-        with open('config.json', 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+            # 保存配置
+            save_config(config)
 
-        # 重新加载代理池
+        # 重新加载代理池，并让缓存的代理页面和模型发现结果失效
         get_api_proxy_pool(reload=True)
+        clear_response_cache()
+        _invalidate_discover_cache(new_proxy['api_base'])
 
         logger.info(f"添加新代理成功: {data['name']}")
         return jsonify({
@@ -114,33 +155,35 @@ def update_proxy():
                 'message': '缺少代理名称'
             }), 400
 
-        # 读取当前配置
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
-
-        # 查找要更新的代理
-        proxy_found = False
-        for i, proxy in enumerate(config.get('third_party_apis', [])):
-            if proxy['name'] == data['name']:
-                # 更新代理配置
-                for key, value in data.items():
-                    if key != 'name':  # 不允许修改名称
-                        proxy[key] = value
-                proxy_found = True
-                break
-
-        if not proxy_found:
-            return jsonify({
-                'success': False,
-                'message': f'未找到代理: {data["name"]}'
-            }), 404
+        with config_write_lock():
+            # 读取当前配置
+            config = load_config()
+
+            # 查找要更新的代理
+            proxy_found = False
+            for i, proxy in enumerate(config.get('third_party_apis', [])):
+                if proxy['name'] == data['name']:
+                    old_api_base = proxy.get('api_base')
+                    # 更新代理配置
+                    for key, value in data.items():
+                        if key != 'name':  # 不允许修改名称
+                            proxy[key] = value
+                    proxy_found = True
+                    break
+
+            if not proxy_found:
+                return jsonify({
+                    'success': False,
+                    'message': f'未找到代理: {data["name"]}'
+                }), 404
 
-        # 保存配置
-        with open('config.json', 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+            # 保存配置
+            save_config(config)
 
-        # 重新加载代理池
+        # 重新加载代理池，并让缓存的代理页面和模型发现结果失效
         get_api_proxy_pool(reload=True)
+        clear_response_cache()
+        _invalidate_discover_cache(old_api_base, proxy.get('api_base'))
 
         logger.info(f"更新代理成功: {data['name']}")
         return jsonify({
@@ -169,29 +212,27 @@ def delete_proxy():
                 'message': '缺少代理名称'
             }), 400
 
-        # 读取当前配置
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        with config_write_lock():
+            # 读取当前配置
+            config = load_config()
 
-        # 查找并删除代理
-        original_count = len(config.get('third_party_apis', []))
-        config['third_party_apis'] = [
-            proxy for proxy in config.get('third_party_apis', [])
-            if proxy['name'] != data['name']
-        ]
-
-        if len(config['third_party_apis']) == original_count:
-            return jsonify({
-                'success': False,
-                'message': f'未找到代理: {data["name"]}'
-            }), 404
+            # 查找并删除代理（名称唯一，找到第一个即可）
+            apis = config.get('third_party_apis', [])
+            index = next((i for i, proxy in enumerate(apis) if proxy['name'] == data['name']), None)
+            if index is None:
+                return jsonify({
+                    'success': False,
+                    'message': f'未找到代理: {data["name"]}'
+                }), 404
+            removed_proxy = apis.pop(index)
 
-        # 保存配置
-        with open('config.json', 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+            # 保存配置
+            save_config(config)
 
-        # 重新加载代理池
+        # 重新加载代理池，并让缓存的代理页面和模型发现结果失效
         get_api_proxy_pool(reload=True)
+        clear_response_cache()
+        _invalidate_discover_cache(removed_proxy.get('api_base'))
 
         logger.info(f"删除代理成功: {data['name']}")
         return jsonify({
@@ -206,6 +247,57 @@ def delete_proxy():
             'message': f'删除代理失败: {str(e)}'
         }), 500
 
+# 模型发现结果缓存：(api_base, 密钥摘要) -> (过期时间, 响应数据)
+DISCOVER_CACHE_TTL = 300
+DISCOVER_CACHE_MAXSIZE = 128
+_discover_cache = {}
+_discover_lock = threading.Lock()
+
+def _discover_cache_key(api_base, api_key):
+    """缓存键只保存密钥摘要，不在内存中长期保留明文密钥"""
+    return api_base, hashlib.blake2b(api_key.encode('utf-8'), digest_size=16).hexdigest()
+
+def _get_discover_cache(key):
+    with _discover_lock:
+        entry = _discover_cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del _discover_cache[key]
+            return None
+        return entry[1]
+
+def _set_discover_cache(key, payload):
+    now = time.time()
+    with _discover_lock:
+        if len(_discover_cache) >= DISCOVER_CACHE_MAXSIZE:
+            # 先清理过期项，仍然满了就淘汰最早写入的一项
+            for expired_key in [k for k, (expires, _) in _discover_cache.items() if expires <= now]:
+                del _discover_cache[expired_key]
+            if len(_discover_cache) >= DISCOVER_CACHE_MAXSIZE:
+                del _discover_cache[next(iter(_discover_cache))]
+        _discover_cache[key] = (now + DISCOVER_CACHE_TTL, payload)
+
+def _invalidate_discover_cache(*api_bases):
+    """代理地址的配置发生变化后，丢弃这些地址的模型发现结果"""
+    api_bases = {api_base.rstrip('/') for api_base in api_bases if api_base}
+    with _discover_lock:
+        for key in [k for k in _discover_cache if k[0] in api_bases]:
+            del _discover_cache[key]
+
+def _extract_model_ids(response):
+    """
+    从 /v1/models 响应中提取模型ID列表
+
+    Returns:
+        Optional[list]: 模型ID列表，返回格式不正确时为None
+    """
+    response_data = orjson.loads(response.content) if orjson else response.json()
+    data = response_data.get('data') if isinstance(response_data, dict) else None
+    if not isinstance(data, list):
+        return None
+    return [model['id'] for model in data if isinstance(model, dict) and 'id' in model]
+
 @proxy_management_bp.route('/api/proxy/test', methods=['POST'])
 @login_required
 def test_proxy():
@@ -234,7 +326,7 @@ def test_proxy():
 
         start_time = time.time()
         try:
-            response = requests.get(test_url, headers=headers, timeout=10, verify=False)
+            response = _http_session.get(test_url, headers=headers, timeout=PROXY_TEST_TIMEOUT)
             response_time = round((time.time() - start_time) * 1000, 2)
 
             if response.status_code == 200:
@@ -248,18 +340,12 @@ def test_proxy():
                 # 如果需要自动填充，获取模型列表和建议信息
                 if auto_fill:
                     try:
-                        response_data = response.json()
-                        if 'data' in response_data and isinstance(response_data['data'], list):
-                            models = []
-                            for model in response_data['data']:
-                                if isinstance(model, dict) and 'id' in model:
-                                    models.append(model['id'])
-
-                            if models:
-                                result['models'] = models
-                                result['default_model'] = auto_select_default_model(models)
-                                result['suggested_name'] = auto_generate_proxy_name(api_base, models)
-                                result['message'] += f'，发现 {len(models)} 个可用模型'
+                        models = _extract_model_ids(response)
+                        if models:
+                            result['models'] = models
+                            result['default_model'] = auto_select_default_model(models)
+                            result['suggested_name'] = auto_generate_proxy_name(api_base, models)
+                            result['message'] += f'，发现 {len(models)} 个可用模型'
                     except Exception as e:
                         logger.warning(f"获取模型信息失败: {str(e)}")
                         # 测试成功但获取模型失败，不影响主要结果
@@ -321,6 +407,12 @@ def discover_models():
         api_base = data['api_base'].rstrip('/')
         api_key = data['api_key']
 
+        # 短时间内重复发现同一代理时直接返回缓存结果
+        cache_key = _discover_cache_key(api_base, api_key)
+        cached = _get_discover_cache(cache_key)
+        if cached is not None:
+            return jsonify(cached)
+
         # 调用模型列表API
         models_url = f"{api_base}/v1/models"
         headers = {
@@ -329,16 +421,11 @@ def discover_models():
         }
 
         try:
-            response = requests.get(models_url, headers=headers, timeout=15, verify=False)
+            response = _http_session.get(models_url, headers=headers, timeout=DISCOVER_MODELS_TIMEOUT)
 
             if response.status_code == 200:
-                response_data = response.json()
-                if 'data' in response_data and isinstance(response_data['data'], list):
-                    models = []
-                    for model in response_data['data']:
-                        if isinstance(model, dict) and 'id' in model:
-                            models.append(model['id'])
-
+                models = _extract_model_ids(response)
+                if models is not None:
                     if models:
                         # 自动选择默认模型
                         default_model = auto_select_default_model(models)
@@ -346,13 +433,15 @@ def discover_models():
                         # 尝试自动生成代理名称
                         suggested_name = auto_generate_proxy_name(api_base, models)
 
-                        return jsonify({
+                        result = {
                             'success': True,
                             'message': f'成功发现 {len(models)} 个模型',
                             'models': models,
                             'default_model': default_model,
                             'suggested_name': suggested_name
-                        })
+                        }
+                        _set_discover_cache(cache_key, result)
+                        return jsonify(result)
                     else:
                         return jsonify({
                             'success': False,
@@ -399,91 +488,118 @@ def discover_models():
             'message': f'发现模型失败: {str(e)}'
         }), 500
 
+# 默认模型优先级列表：从最优到次优
+PRIORITY_MODELS = [
+    # GPT系列
+    'gpt-4o', 'gpt-4o-mini', 'gpt-4-turbo', 'gpt-4', 'gpt-3.5-turbo',
+    # Claude系列
+    'claude-3-5-sonnet-20241022', 'claude-3-5-sonnet', 'claude-3-opus', 'claude-3-sonnet', 'claude-3-haiku',
+    # Gemini系列
+    'gemini-1.5-pro', 'gemini-1.5-flash', 'gemini-pro',
+    # 其他流行模型
+    'llama-3.1-405b', 'llama-3.1-70b', 'llama-3.1-8b',
+    'qwen-max', 'qwen-plus', 'qwen-turbo',
+    'deepseek-chat', 'deepseek-coder',
+    'yi-large', 'yi-medium',
+    'moonshot-v1-128k', 'moonshot-v1-32k', 'moonshot-v1-8k'
+]
+
+# 没有优先模型时使用的常见关键词
+COMMON_MODEL_KEYWORDS = ['gpt', 'claude', 'gemini', 'llama', 'qwen', 'chat', 'turbo']
+
+# 预先转为小写，避免每次调用时重复 lower()
+_PRIORITY_MODELS_LC = tuple(m.lower() for m in PRIORITY_MODELS)
+_COMMON_MODEL_KEYWORDS_LC = tuple(k.lower() for k in COMMON_MODEL_KEYWORDS)
+
+# 预编译的匹配器：每个模型只需扫描一次即可判断是否包含任意一个候选词
+_PRIORITY_MODEL_RE = re.compile('|'.join(re.escape(m) for m in _PRIORITY_MODELS_LC))
+_MODEL_KEYWORD_RE = re.compile('|'.join(re.escape(k) for k in _COMMON_MODEL_KEYWORDS_LC))
+
 def auto_select_default_model(models):
     """自动选择默认模型"""
-    # 优先级列表：从最优到次优
-    priority_models = [
-        # GPT系列
-        'gpt-4o', 'gpt-4o-mini', 'gpt-4-turbo', 'gpt-4', 'gpt-3.5-turbo',
-        # Claude系列
-        'claude-3-5-sonnet-20241022', 'claude-3-5-sonnet', 'claude-3-opus', 'claude-3-sonnet', 'claude-3-haiku',
-        # Gemini系列
-        'gemini-1.5-pro', 'gemini-1.5-flash', 'gemini-pro',
-        # 其他流行模型
-        'llama-3.1-405b', 'llama-3.1-70b', 'llama-3.1-8b',
-        'qwen-max', 'qwen-plus', 'qwen-turbo',
-        'deepseek-chat', 'deepseek-coder',
-        'yi-large', 'yi-medium',
-        'moonshot-v1-128k', 'moonshot-v1-32k', 'moonshot-v1-8k'
-    ]
-
-    # 按优先级查找
-    for priority_model in priority_models:
-        for model in models:
-            if priority_model.lower() in model.lower():
+    # 每个模型名只转换一次小写
+    models_lc = [model.lower() for model in models]
+
+    # 先用预编译的正则筛出包含任意优先模型名的候选，再按优先级查找
+    candidates = [(model_lc, model) for model_lc, model in zip(models_lc, models)
+                  if _PRIORITY_MODEL_RE.search(model_lc)]
+    for priority_model in _PRIORITY_MODELS_LC:
+        for model_lc, model in candidates:
+            if priority_model in model_lc:
                 return model
 
     # 如果没有找到优先模型，选择第一个包含常见关键词的模型
-    common_keywords = ['gpt', 'claude', 'gemini', 'llama', 'qwen', 'chat', 'turbo']
-    for keyword in common_keywords:
-        for model in models:
-            if keyword.lower() in model.lower():
+    candidates = [(model_lc, model) for model_lc, model in zip(models_lc, models)
+                  if _MODEL_KEYWORD_RE.search(model_lc)]
+    for keyword in _COMMON_MODEL_KEYWORDS_LC:
+        for model_lc, model in candidates:
+            if keyword in model_lc:
                 return model
 
     # 最后返回第一个模型
     return models[0] if models else ''
 
+# 域名关键词 -> 代理名称，按顺序匹配，靠前的优先
+DOMAIN_PROXY_NAMES = [
+    ('openai', 'OpenAI API'),
+    ('anthropic', 'Claude API'), ('claude', 'Claude API'),
+    ('google', 'Gemini API'), ('gemini', 'Gemini API'),
+    ('deepseek', 'DeepSeek API'),
+    ('moonshot', 'Moonshot API'),
+    ('qwen', 'Qwen API'), ('alibaba', 'Qwen API'),
+    ('yi', 'Yi API'), ('01.ai', 'Yi API'),
+    ('baidu', 'Baidu API'),
+    ('tencent', 'Tencent API'),
+    ('hunyuan', 'Hunyuan API')
+]
+
+# 模型名称关键词 -> 代理名称，按顺序匹配，靠前的优先
+MODEL_PROXY_NAMES = [
+    ('gpt', 'GPT API'),
+    ('claude', 'Claude API'),
+    ('gemini', 'Gemini API'),
+    ('llama', 'Llama API'),
+    ('qwen', 'Qwen API'),
+    ('deepseek', 'DeepSeek API'),
+    ('yi', 'Yi API')
+]
+
+def _build_name_matcher(table):
+    """把 (关键词, 名称) 列表编译成一个正则和 关键词 -> (优先级, 名称) 的字典"""
+    ranks = {}
+    for rank, (keyword, name) in enumerate(table):
+        ranks.setdefault(keyword, (rank, name))
+    # 长关键词放前面，避免被其中包含的短关键词抢先匹配
+    keywords = sorted(ranks, key=len, reverse=True)
+    return re.compile('|'.join(re.escape(k) for k in keywords)), ranks
+
+_DOMAIN_NAME_RE, _DOMAIN_NAME_RANKS = _build_name_matcher(DOMAIN_PROXY_NAMES)
+_MODEL_NAME_RE, _MODEL_NAME_RANKS = _build_name_matcher(MODEL_PROXY_NAMES)
+_DOMAIN_PREFIX_RE = re.compile(r'api\.|www\.')
+
+def _match_proxy_name(text, pattern, ranks):
+    """单次扫描找出文本中优先级最高的关键词对应的名称"""
+    matches = pattern.findall(text)
+    if not matches:
+        return None
+    return min(ranks[m] for m in matches)[1]
+
 def auto_generate_proxy_name(api_base, models):
     """自动生成代理名称"""
     try:
-        from urllib.parse import urlparse
-
-        # 解析URL获取域名
-        parsed_url = urlparse(api_base)
-        domain = parsed_url.netloc.lower()
-
-        # 移除常见前缀
-        domain = domain.replace('api.', '').replace('www.', '')
+        # 解析URL获取域名，并移除常见前缀
+        domain = _DOMAIN_PREFIX_RE.sub('', urlparse(api_base).netloc.lower())
 
         # 根据域名特征生成名称
-        if 'openai' in domain:
-            return 'OpenAI API'
-        elif 'anthropic' in domain or 'claude' in domain:
-            return 'Claude API'
-        elif 'google' in domain or 'gemini' in domain:
-            return 'Gemini API'
-        elif 'deepseek' in domain:
-            return 'DeepSeek API'
-        elif 'moonshot' in domain:
-            return 'Moonshot API'
-        elif 'qwen' in domain or 'alibaba' in domain:
-            return 'Qwen API'
-        elif 'yi' in domain or '01.ai' in domain:
-            return 'Yi API'
-        elif 'baidu' in domain:
-            return 'Baidu API'
-        elif 'tencent' in domain:
-            return 'Tencent API'
-        elif 'hunyuan' in domain:
-            return 'Hunyuan API'
+        name = _match_proxy_name(domain, _DOMAIN_NAME_RE, _DOMAIN_NAME_RANKS)
+        if name:
+            return name
 
         # 根据模型名称推断
         if models:
-            first_model = models[0].lower()
-            if 'gpt' in first_model:
-                return 'GPT API'
-            elif 'claude' in first_model:
-                return 'Claude API'
-            elif 'gemini' in first_model:
-                return 'Gemini API'
-            elif 'llama' in first_model:
-                return 'Llama API'
-            elif 'qwen' in first_model:
-                return 'Qwen API'
-            elif 'deepseek' in first_model:
-                return 'DeepSeek API'
-            elif 'yi' in first_model:
-                return 'Yi API'
+            name = _match_proxy_name(models[0].lower(), _MODEL_NAME_RE, _MODEL_NAME_RANKS)
+            if name:
+                return name
 
         # 使用域名的主要部分
         domain_parts = domain.split('.')
@@ -503,11 +619,10 @@ def auto_generate_proxy_name(api_base, models):
 def get_health_status():
     """获取所有代理的健康状态"""
     try:
-        with health_check_lock:
-            return jsonify({
-                'success': True,
-                'health_status': health_check_results.copy()
-            })
+        return jsonify({
+            'success': True,
+            'health_status': health_check_results
+        })
     except Exception as e:
         logger.error(f"获取健康状态失败: {str(e)}")
         return jsonify({
@@ -515,75 +630,142 @@ def get_health_status():
             'message': f'获取健康状态失败: {str(e)}'
         }), 500
 
-def check_proxy_health(proxy_name, api_base, api_key):
-    """检查单个代理的健康状态"""
+# 单个代理健康检查的超时时间（秒）
+HEALTH_CHECK_TIMEOUT = 10
+
+# 各代理 /v1/models 上次返回的ETag，下次检查时带上 If-None-Match，未变化时上游只需返回304
+_health_etags = {}
+# 不返回ETag的代理退回比较响应体摘要，判断模型列表是否变化
+_health_digests = {}
+
+async def check_proxy_health(session, proxy_name, api_base, api_key, checked_at):
+    """检查单个代理的健康状态，返回 (代理名称, 检查结果)"""
+    status_code = None
+    response_time = None
+    models_changed = None
     try:
         test_url = f"{api_base.rstrip('/')}/v1/models"
         headers = {
             'Authorization': f'Bearer {api_key}',
             'Content-Type': 'application/json'
         }
+        etag_key = (proxy_name, api_base)
+        etag = _health_etags.get(etag_key)
+        if etag:
+            headers['If-None-Match'] = etag
 
         start_time = time.time()
-        response = requests.get(test_url, headers=headers, timeout=10, verify=False)
-        response_time = round((time.time() - start_time) * 1000, 2)
-
-        with health_check_lock:
-            health_check_results[proxy_name] = {
-                'status': 'online' if response.status_code == 200 else 'error',
-                'response_time': response_time,
-                'status_code': response.status_code,
-                'last_check': datetime.now().isoformat(),
-                'error_message': None if response.status_code == 200 else f'HTTP {response.status_code}'
-            }
-
-    except requests.exceptions.Timeout:
-        with health_check_lock:
-            health_check_results[proxy_name] = {
-                'status': 'timeout',
-                'response_time': 10000,
-                'status_code': None,
-                'last_check': datetime.now().isoformat(),
-                'error_message': '连接超时'
-            }
+        async with session.get(test_url, headers=headers) as response:
+            response_time = round((time.time() - start_time) * 1000, 2)
+            status_code = response.status
+            if status_code == 200:
+                new_etag = response.headers.get('ETag')
+                if new_etag:
+                    models_changed = new_etag != etag
+                    _health_etags[etag_key] = new_etag
+                    _health_digests.pop(etag_key, None)
+                else:
+                    _health_etags.pop(etag_key, None)
+                    # 只计算摘要，不解析JSON
+                    digest = hashlib.blake2b(await response.read(), digest_size=8).digest()
+                    models_changed = digest != _health_digests.get(etag_key)
+                    _health_digests[etag_key] = digest
+            elif status_code == 304:
+                models_changed = False
+
+        # 304 表示模型列表未变化，同样视为在线
+        if status_code in (200, 304):
+            status, error_message = 'online', None
+        else:
+            status, error_message = 'error', f'HTTP {status_code}'
+
+    except asyncio.TimeoutError:
+        status, error_message = 'timeout', '连接超时'
+        response_time = HEALTH_CHECK_TIMEOUT * 1000
     except Exception as e:
-        with health_check_lock:
-            health_check_results[proxy_name] = {
-                'status': 'offline',
-                'response_time': None,
-                'status_code': None,
-                'last_check': datetime.now().isoformat(),
-                'error_message': str(e)
-            }
+        status, error_message = 'offline', str(e)
+
+    return proxy_name, {
+        'status': status,
+        'response_time': response_time,
+        'status_code': status_code,
+        'last_check': checked_at,
+        'error_message': error_message,
+        'models_changed': models_changed
+    }
+
+async def _check_all_proxies(targets):
+    """在同一个事件循环中并发检查所有代理"""
+    # 同一轮检查共用一个检查时间
+    checked_at = datetime.now().isoformat()
+    timeout = aiohttp.ClientTimeout(total=HEALTH_CHECK_TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=0, ssl=_PROBE_SSL_CONTEXT)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        return await asyncio.gather(
+            *(check_proxy_health(session, name, api_base, api_key, checked_at)
+              for name, api_base, api_key in targets)
+        )
+
+# 健康检查的基础间隔和失败退避上限（秒）
+HEALTH_CHECK_INTERVAL = 60
+HEALTH_CHECK_MAX_INTERVAL = 1800
+
+# 每个代理当前的检查间隔和下次检查时间，失败时间隔翻倍，成功后恢复
+_health_intervals = {}
+_health_next_due = {}
 
 def run_health_checks():
-    """运行所有代理的健康检查"""
+    """
+    运行到期代理的健康检查
+
+    Returns:
+        float: 距离下一个代理到期还需等待的秒数
+    """
+    global health_check_results
     try:
         # 读取配置
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        config = load_config(readonly=True)
 
-        proxies = config.get('third_party_apis', [])
-        threads = []
-
-        for proxy in proxies:
+        now = time.time()
+        active_names = set()
+        targets = []
+        for proxy in config.get('third_party_apis', []):
             if proxy.get('is_active', True) and proxy.get('api_keys'):
+                active_names.add(proxy['name'])
+                if _health_next_due.get(proxy['name'], 0) > now:
+                    continue
                 # 使用第一个API密钥进行健康检查
                 api_key = proxy['api_keys'][0] if isinstance(proxy['api_keys'], list) else proxy['api_keys']
-                thread = threading.Thread(
-                    target=check_proxy_health,
-                    args=(proxy['name'], proxy['api_base'], api_key)
-                )
-                thread.daemon = True
-                thread.start()
-                threads.append(thread)
-
-        # 等待所有检查完成
-        for thread in threads:
-            thread.join(timeout=15)
+                targets.append((proxy['name'], proxy['api_base'], api_key))
+
+        results = asyncio.run(_check_all_proxies(targets)) if targets else []
+
+        now = time.time()
+        for proxy_name, result in results:
+            if result['status'] == 'online':
+                interval = HEALTH_CHECK_INTERVAL
+            else:
+                interval = min(_health_intervals.get(proxy_name, HEALTH_CHECK_INTERVAL) * 2, HEALTH_CHECK_MAX_INTERVAL)
+            _health_intervals[proxy_name] = interval
+            _health_next_due[proxy_name] = now + interval
+
+        # 清理已删除或已禁用代理的调度状态
+        for proxy_name in set(_health_next_due) - active_names:
+            _health_next_due.pop(proxy_name, None)
+            _health_intervals.pop(proxy_name, None)
+
+        # 本轮未到期的代理沿用上次结果，整体替换字典，引用赋值是原子的
+        new_results = {name: result for name, result in health_check_results.items() if name in active_names}
+        new_results.update(results)
+        health_check_results = new_results
+
+        if not _health_next_due:
+            return HEALTH_CHECK_INTERVAL
+        return min(_health_next_due.values()) - now
 
     except Exception as e:
         logger.error(f"健康检查失败: {str(e)}")
+        return HEALTH_CHECK_INTERVAL
 
 # 健康检查定时器
 health_check_timer = None
@@ -595,11 +777,12 @@ def start_health_check_timer():
     def health_check_loop():
         while True:
             try:
-                run_health_checks()
-                time.sleep(60)  # 每60秒检查一次
+                wait_seconds = run_health_checks()
+                # 睡到下一个代理到期为止，至少1秒
+                time.sleep(max(1, wait_seconds))
             except Exception as e:
                 logger.error(f"健康检查循环异常: {str(e)}")
-                time.sleep(60)
+                time.sleep(HEALTH_CHECK_INTERVAL)
 
     if health_check_timer is None or not health_check_timer.is_alive():
         health_check_timer = threading.Thread(target=health_check_loop, daemon=True)
@@ -621,8 +804,7 @@ def get_proxy_full_info():
             }), 400
 
         # 读取配置文件获取完整信息
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        config = load_config(readonly=True)
 
         # 查找代理
         for proxy in config.get('third_party_apis', []):
@@ -666,31 +848,31 @@ def toggle_proxy_status():
                 'message': '缺少代理名称'
             }), 400
 
-        # 读取当前配置
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        with config_write_lock():
+            # 读取当前配置
+            config = load_config()
 
-        # 查找并切换代理状态
-        proxy_found = False
-        for proxy in config.get('third_party_apis', []):
-            if proxy['name'] == data['name']:
-                proxy['is_active'] = not proxy.get('is_active', True)
-                new_status = '启用' if proxy['is_active'] else '禁用'
-                proxy_found = True
-                break
+            # 查找并切换代理状态
+            proxy_found = False
+            for proxy in config.get('third_party_apis', []):
+                if proxy['name'] == data['name']:
+                    proxy['is_active'] = not proxy.get('is_active', True)
+                    new_status = '启用' if proxy['is_active'] else '禁用'
+                    proxy_found = True
+                    break
 
-        if not proxy_found:
-            return jsonify({
-                'success': False,
-                'message': f'未找到代理: {data["name"]}'
-            }), 404
+            if not proxy_found:
+                return jsonify({
+                    'success': False,
+                    'message': f'未找到代理: {data["name"]}'
+                }), 404
 
-        # 保存配置
-        with open('config.json', 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+            # 保存配置
+            save_config(config)
 
-        # 重新加载代理池
+        # 重新加载代理池，并让缓存的代理页面失效
         get_api_proxy_pool(reload=True)
+        clear_response_cache()
 
         logger.info(f"切换代理状态成功: {data['name']} -> {new_status}")
         return jsonify({
@@ -2,7 +2,7 @@ from flask import Blueprint, render_template
 from config import Config
 from config.api_proxy_pool import get_api_proxy_pool
 import time
-from utils import login_required, admin_required
+from utils import login_required, admin_required, cached_response
 
 proxy_pool_bp = Blueprint('proxy_pool', __name__)
 
@@ -10,6 +10,7 @@ proxy_pool_bp = Blueprint('proxy_pool', __name__)
 @proxy_pool_bp.route('/proxy-monitor', methods=['GET'])
 @login_required
 @admin_required
+@cached_response(timeout=3)
 def proxy_monitor():
     current_year = time.localtime().tm_year
     uptime_seconds = time.time() - 0
@@ -1,5 +1,5 @@
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, send_file, current_app, g
-from models import QARecord, get_db_session, close_db_session
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, send_file, current_app, g, Response, stream_with_context
+from models import QARecord, QuestionTypeStat, get_db_session, close_db_session
 from utils import login_required, admin_required
 from utils.logger import app_logger as logger
 from utils.question_cleaner import clean_question_prefix
@@ -7,6 +7,16 @@ from services.search_service import SearchService
 from services import RedisCache
 from config.config import Config
 from datetime import datetime
+from sqlalchemy import func, or_, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.mysql import insert as mysql_insert, match as mysql_match
+from sqlalchemy.orm import load_only
+import csv
+import io
+import itertools
+import json
+import logging
+import threading
 import time
 # 使用系统日志记录器，确保题目录入日志显示在日志页面上
 
@@ -24,69 +34,299 @@ class SimpleCache:
 # 创建全局缓存实例
 question_cache = SimpleCache()
 
+# 导出时每批从数据库游标取出并写出的行数
+EXPORT_BATCH_SIZE = 1000
+
+# 关键词至少这么长才走全文索引（ngram_token_size 默认为 2），更短的仍用 LIKE
+FULLTEXT_MIN_TERM_LENGTH = 2
+FULLTEXT_INDEX_SQL = text(
+    "SELECT COUNT(*) FROM information_schema.STATISTICS "
+    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'qa_records' AND INDEX_NAME = 'ft_question_answer'"
+)
+_fulltext_available = None
+# 索引不存在时隔多久重新检查（秒），迁移后运行中的进程无需重启即可改用全文索引
+FULLTEXT_RECHECK_INTERVAL = 60
+_fulltext_checked_at = 0.0
+
+# CSV 导入每块读取并写入的行数，内存占用与文件大小无关
+IMPORT_CHUNK_SIZE = 5000
+
+# 导入查重时单条 IN 查询携带的题干数量上限
+DEDUPE_CHUNK_SIZE = 500
+
+# 允许跨域调用的来源，app.py 中的 flask_cors 配置以此为准
+ALLOWED_ORIGINS = frozenset({"https://mooc2-ans.chaoxing.com", "http://localhost:8080", "http://127.0.0.1:8080"})
+
+# 批量删除时单条 IN (...) 携带的ID数量上限，避免超长参数列表拖慢优化器
+DELETE_CHUNK_SIZE = 1000
+
+# 题型统计缓存：进程内缓存 TYPE_COUNTS_TTL 秒，Redis 中各 worker 共享 TYPE_COUNTS_REDIS_TTL 秒；
+# 增删改会同时清除两级缓存
+TYPE_COUNTS_TTL = 30
+TYPE_COUNTS_REDIS_TTL = 300
+TYPE_COUNTS_CACHE_KEY = 'question_type_counts'
+# 进程内缓存失效时只让一个线程去 Redis/数据库取数，其余线程等待结果
+_type_counts_lock = threading.Lock()
+
+# 本模块共用的 Redis 缓存（redis-py 内部带连接池），未启用 Redis 时为 None
+_redis_cache = None
+_redis_cache_lock = threading.Lock()
+
+# 题型列表，统计与校验共用
+QUESTION_TYPES = ('single', 'multiple', 'judgement', 'completion', 'short', 'essay', 'calculation', 'analysis', 'case', 'matching')
+# 导入时校验题型用的集合，成员判断 O(1)
+VALID_TYPES = frozenset(QUESTION_TYPES)
+
 # 创建蓝图
 questions_bp = Blueprint('questions', __name__)
 
 # 初始化搜索服务
+# 搜索服务本身无状态，进程内共用一个实例，不再每个请求重建 Redis 客户端
+_search_service = None
+
 def get_search_service():
     """获取搜索服务实例"""
-    try:
-        # 尝试获取Redis缓存
-        cache = None
-        if hasattr(Config, 'REDIS_ENABLED') and Config.REDIS_ENABLED:
-            from services import RedisCache
-            cache = RedisCache(Config.CACHE_EXPIRATION)
-        return SearchService(cache)
-    except Exception as e:
-        logger.warning(f"初始化搜索服务失败，使用基础功能: {str(e)}")
-        return SearchService(None)
+    global _search_service
+    if _search_service is None:
+        try:
+            # 尝试获取Redis缓存
+            cache = get_redis_cache()
+        except Exception as e:
+            logger.warning(f"初始化搜索服务失败，使用基础功能: {str(e)}")
+            cache = None
+        _search_service = SearchService(cache)
+    return _search_service
+
+def get_redis_cache():
+    """获取共用的 RedisCache 实例，未启用 Redis 时返回 None"""
+    global _redis_cache
+    if _redis_cache is None and getattr(Config, 'REDIS_ENABLED', False):
+        with _redis_cache_lock:
+            if _redis_cache is None:
+                _redis_cache = RedisCache(Config.CACHE_EXPIRATION)
+    return _redis_cache
 
 def get_cached_type_counts():
     """获取缓存的题型统计数据"""
-    cache_key = 'question_type_counts'
-
-    # 尝试从缓存获取
-    if hasattr(question_cache, 'cache') and cache_key in question_cache.cache:
-        cached_data = question_cache.cache[cache_key]
-        # 检查缓存是否过期（5分钟）
-        if time.time() - cached_data['timestamp'] < 300:
+    # 尝试从进程内缓存获取
+    cached_data = question_cache.cache.get(TYPE_COUNTS_CACHE_KEY)
+    if cached_data and time.time() - cached_data['timestamp'] < TYPE_COUNTS_TTL:
+        return cached_data['data']
+
+    with _type_counts_lock:
+        # 等锁期间可能已有其他线程刷新
+        cached_data = question_cache.cache.get(TYPE_COUNTS_CACHE_KEY)
+        if cached_data and time.time() - cached_data['timestamp'] < TYPE_COUNTS_TTL:
             return cached_data['data']
 
-    # 缓存过期或不存在，重新查询
-    from sqlalchemy import func
-    type_stats = g.db.query(
-        QARecord.type,
-        func.count(QARecord.id).label('count')
-    ).group_by(QARecord.type).all()
+        type_counts = _load_shared_type_counts()
+        if type_counts is None:
+            type_counts = _query_type_counts()
+            _store_shared_type_counts(type_counts)
 
-    # 构建统计字典
-    type_counts = {
-        'all': sum(stat.count for stat in type_stats),
-        'single': 0,
-        'multiple': 0,
-        'judgement': 0,
-        'completion': 0,
-        'short': 0,
-        'essay': 0,
-        'calculation': 0,
-        'analysis': 0,
-        'case': 0,
-        'matching': 0,
-    }
-
-    # 填充实际统计数据
-    for stat in type_stats:
-        if stat.type in type_counts:
-            type_counts[stat.type] = stat.count
-
-    # 缓存数据
-    question_cache.cache[cache_key] = {
-        'data': type_counts,
-        'timestamp': time.time()
-    }
+        question_cache.cache[TYPE_COUNTS_CACHE_KEY] = {
+            'data': type_counts,
+            'timestamp': time.time()
+        }
+    return type_counts
 
+def _load_shared_type_counts():
+    """从 Redis 读取其他 worker 已统计好的题型计数，未命中或 Redis 不可用时返回 None"""
+    redis_cache = get_redis_cache()
+    if redis_cache is None:
+        return None
+    try:
+        cached = redis_cache.redis.get(TYPE_COUNTS_CACHE_KEY)
+        return json.loads(cached) if cached else None
+    except Exception as e:
+        logger.warning(f"读取Redis题型统计缓存失败: {str(e)}")
+        return None
+
+def _store_shared_type_counts(type_counts):
+    """把题型计数写入 Redis 供其他 worker 复用"""
+    redis_cache = get_redis_cache()
+    if redis_cache is None:
+        return
+    try:
+        redis_cache.redis.setex(TYPE_COUNTS_CACHE_KEY, TYPE_COUNTS_REDIS_TTL, json.dumps(type_counts))
+    except Exception as e:
+        logger.warning(f"写入Redis题型统计缓存失败: {str(e)}")
+
+def _query_type_counts():
+    """读取全部题型计数：优先读触发器维护的计数表，未执行迁移（计数表为空）时退回一条 GROUP BY"""
+    type_stats = g.db.query(QuestionTypeStat.type, QuestionTypeStat.count).all()
+    if not type_stats:
+        type_stats = g.db.query(
+            QARecord.type,
+            func.count(QARecord.id)
+        ).group_by(QARecord.type).all()
+
+    # 构建统计字典
+    type_counts = dict.fromkeys(('all',) + QUESTION_TYPES, 0)
+    for stat_type, count in type_stats:
+        type_counts['all'] += count
+        if stat_type in type_counts:
+            type_counts[stat_type] = count
     return type_counts
 
+def invalidate_type_counts():
+    """题目增删改后清除题型统计缓存，下次访问题库页面时重新统计"""
+    question_cache.cache.pop(TYPE_COUNTS_CACHE_KEY, None)
+    redis_cache = get_redis_cache()
+    if redis_cache is not None:
+        try:
+            redis_cache.redis.delete(TYPE_COUNTS_CACHE_KEY)
+        except Exception as e:
+            logger.warning(f"清除Redis题型统计缓存失败: {str(e)}")
+
+def _fold(value):
+    """按 MySQL 默认排序规则的比较方式规范化文本：忽略大小写和尾部空格"""
+    return value.rstrip(' ').casefold() if value else value
+
+def dedupe_key(question, question_type, options):
+    """导入查重使用的键
+
+    查重原先在 SQL 中按列排序规则比较（大小写不敏感、忽略尾部空格），改为字典查找后两侧都用同样规则规范化，
+    NULL 选项与空串一致（同 sig_hash 的 COALESCE(options, '')）
+    """
+    return (_fold(question), _fold(question_type), _fold(options or ''))
+
+def load_existing_records(db_session, question_texts):
+    """按题干批量预取已存在的题目，返回 dedupe_key -> {'id', 'answer'} 映射，替代逐条查重
+
+    只取查重和更新需要的列，不构造 ORM 对象，返回的字典可直接交给 bulk_update_mappings
+    """
+    question_texts = list(set(question_texts))
+    existing_index = {}
+    for i in range(0, len(question_texts), DEDUPE_CHUNK_SIZE):
+        chunk = question_texts[i:i + DEDUPE_CHUNK_SIZE]
+        rows = db_session.query(
+            QARecord.id, QARecord.question, QARecord.type, QARecord.options, QARecord.answer
+        ).filter(QARecord.question.in_(chunk))
+        for record_id, question, question_type, options, answer in rows:
+            existing_index[dedupe_key(question, question_type, options)] = {'id': record_id, 'answer': answer}
+    return existing_index
+
+def has_fulltext_index(db_session):
+    """检查迁移脚本是否已在 MySQL 上创建 ft_question_answer 全文索引
+
+    结果按进程缓存：存在后不再检查；不存在时每 FULLTEXT_RECHECK_INTERVAL 秒重新检查一次
+    """
+    global _fulltext_available, _fulltext_checked_at
+    if _fulltext_available:
+        return True
+    if db_session.get_bind().dialect.name != 'mysql':
+        return False
+    now = time.monotonic()
+    if _fulltext_available is None or now - _fulltext_checked_at >= FULLTEXT_RECHECK_INTERVAL:
+        _fulltext_available = db_session.execute(FULLTEXT_INDEX_SQL).scalar() > 0
+        _fulltext_checked_at = now
+    return _fulltext_available
+
+def insert_new_records(db_session, new_rows):
+    """批量插入新题目；MySQL 上与已有题目的 sig_hash 冲突时改为更新答案，并发导入同一题目也不会产生重复行"""
+    if not new_rows:
+        return
+    if db_session.get_bind().dialect.name != 'mysql':
+        db_session.bulk_insert_mappings(QARecord, new_rows)
+        return
+    stmt = mysql_insert(QARecord)
+    stmt = stmt.on_duplicate_key_update(answer=stmt.inserted.answer, created_at=stmt.inserted.created_at)
+    db_session.execute(stmt, new_rows)
+
+def save_single_record(db_session, question, question_type, options, answer):
+    """录入单个题目（不提交），已存在则更新答案；返回 True 表示更新了已有题目
+
+    新题目走 insert_new_records，并发写入同一题目时由 uq_qa_sig 冲突转为更新，不会抛出 IntegrityError
+    """
+    now = datetime.now()
+    # 无选项时 NULL 与空串视为同一题（同 sig_hash 的 COALESCE(options, '')），拆成两个条件以便使用 idx_qa_dedupe
+    if options:
+        options_condition = QARecord.options == options
+    else:
+        options_condition = or_(QARecord.options == '', QARecord.options.is_(None))
+    existing = db_session.query(QARecord).options(load_only(QARecord.id)).filter(
+        QARecord.question == question,
+        QARecord.type == question_type,
+        options_condition
+    ).first()
+    if existing:
+        existing.answer = answer
+        existing.created_at = now
+        return True
+    insert_new_records(db_session, [{
+        'question': question,
+        'type': question_type,
+        'options': options or None,
+        'answer': answer,
+        'created_at': now
+    }])
+    return False
+
+class _UploadStream(io.RawIOBase):
+    """把上传文件流包装为可读的原始流
+
+    Python 3.9 的 SpooledTemporaryFile 没有 readable()/readinto()，不能直接交给 io.TextIOWrapper
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+def _import_csv_chunk(db_session, rows, now):
+    """导入一块CSV数据行（不提交），返回 (成功数, 失败数)"""
+    imported_count = 0
+    error_count = 0
+    valid_rows = []
+    for row in rows:
+        if len(row) < 5:
+            error_count += 1
+            continue
+        valid_rows.append(row)
+
+    # 一次性预取库中已有的同题干记录，循环内只做字典查找
+    existing_index = load_existing_records(db_session, (row[1].strip() for row in valid_rows))
+    new_rows = []
+    updates = {}
+    for row in valid_rows:
+        try:
+            question = row[1].strip()
+            question_type = row[2].strip() if row[2].strip() != '未知' else None
+            options = row[3].strip()
+            answer = row[4].strip()
+            key = dedupe_key(question, question_type, options)
+            existing = existing_index.get(key)
+            if existing:
+                existing['answer'] = answer
+                existing['created_at'] = now
+                if 'id' in existing:
+                    updates[existing['id']] = existing
+            else:
+                new_row = {
+                    'question': question,
+                    'type': question_type,
+                    'options': options,
+                    'answer': answer,
+                    'created_at': now
+                }
+                new_rows.append(new_row)
+                # 同一块内的重复题目更新刚加入的记录
+                existing_index[key] = new_row
+            imported_count += 1
+        except Exception as e:
+            error_count += 1
+    # 批量写入，跳过逐对象的 unit-of-work 开销
+    insert_new_records(db_session, new_rows)
+    db_session.bulk_update_mappings(QARecord, list(updates.values()))
+    return imported_count, error_count
+
 @questions_bp.route('/questions', methods=['GET'])
 @login_required
 def questions():
@@ -97,6 +337,8 @@ def questions():
     # 获取搜索参数
     page = request.args.get('page', 1, type=int)
     per_page = min(request.args.get('per_page', 10, type=int), 50)  # 限制每页最大数量
+    cursor_id = request.args.get('cursor_id', type=int)  # 上一页最后一条记录ID，用于游标翻页
+    include_total = request.args.get('include_total') == '1'  # 总数仅在显式请求时统计
     search_query = request.args.get('q', '')
     current_type = request.args.get('type', '')
     difficulty = request.args.get('difficulty', '')
@@ -122,7 +364,10 @@ def questions():
         sort_by=sort_by,
         sort_order=sort_order,
         page=page,
-        per_page=per_page
+        per_page=per_page,
+        cursor_id=cursor_id,
+        compact=True,
+        include_total=include_total
     )
 
     # 使用缓存的题型统计
@@ -144,7 +389,8 @@ def questions():
     return render_template(
         'questions.html',
         records=search_result.get('data', []),
-        total_pages=search_result.get('pagination', {}).get('pages', 0),
+        total_pages=search_result.get('pagination', {}).get('pages'),
+        next_cursor=search_result.get('pagination', {}).get('next_cursor'),
         page=page,
         per_page=per_page,
         search_query=search_query,
@@ -174,38 +420,60 @@ def export_questions():
         search_query = request.args.get('q', '')
         logger.info(f"导出条件: 类型={question_type or '全部'}, 关键词='{search_query}'")
 
-        query = g.db.query(QARecord)
+        # 只查询导出的六列，逐行得到轻量 Row，不构造 ORM 对象
+        query = g.db.query(
+            QARecord.id, QARecord.question, QARecord.type,
+            QARecord.options, QARecord.answer, QARecord.created_at
+        )
         if search_query:
-            query = query.filter(QARecord.question.like(f'%{search_query}%') | QARecord.answer.like(f'%{search_query}%'))
+            # 有全文索引时用 ngram 短语匹配走索引，前置通配的 LIKE 只能全表扫描
+            phrase = search_query.replace('"', ' ').strip()
+            if len(phrase) >= FULLTEXT_MIN_TERM_LENGTH and has_fulltext_index(g.db):
+                query = query.filter(
+                    mysql_match(QARecord.question, QARecord.answer, against=f'"{phrase}"').in_boolean_mode()
+                )
+            else:
+                query = query.filter(QARecord.question.like(f'%{search_query}%') | QARecord.answer.like(f'%{search_query}%'))
         if question_type:
             query = query.filter(QARecord.type == question_type)
-        records = query.all()
-        logger.info(f"查询到 {len(records)} 条题目记录")
-        import csv
-        import io
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['ID', '问题', '类型', '选项', '答案', '创建时间'])
-        for record in records:
-            writer.writerow([
-                record.id,
-                record.question,
-                record.type or '未知',
-                record.options or '',
-                record.answer,
-                record.created_at.strftime('%Y-%m-%d %H:%M:%S')
-            ])
-        from flask import Response
-        response = Response(
-            output.getvalue(),
+        # 服务端游标分批取行，边查边写，内存占用与总行数无关
+        stream = query.execution_options(stream_results=True).yield_per(EXPORT_BATCH_SIZE)
+
+        def generate():
+            # csv 直接编码写入字节缓冲区，产出 bytes，省去 getvalue() 拷贝后再整体编码一遍
+            buffer = io.BytesIO()
+            text = io.TextIOWrapper(buffer, encoding='utf-8', newline='')
+            writer = csv.writer(text)
+            writer.writerow(['ID', '问题', '类型', '选项', '答案', '创建时间'])
+            exported_count = 0
+            for record in stream:
+                writer.writerow([
+                    record.id,
+                    record.question,
+                    record.type or '未知',
+                    record.options or '',
+                    record.answer,
+                    # isoformat 由C实现，输出与 '%Y-%m-%d %H:%M:%S' 相同，比 strftime 快
+                    record.created_at.isoformat(sep=' ', timespec='seconds') if record.created_at else ''
+                ])
+                exported_count += 1
+                if exported_count % EXPORT_BATCH_SIZE == 0:
+                    text.flush()
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            text.flush()
+            yield buffer.getvalue()
+
+            duration = round(time.time() - start_time, 2)
+            logger.info(f"导出题库数据成功 | 总计 {exported_count} 条记录 | 耗时 {duration} 秒")
+
+        return Response(
+            stream_with_context(generate()),
             mimetype='text/csv',
-            headers={'Content-Disposition': 'attachment;filename=questions.csv'}
+            headers={'Content-Disposition': 'attachment;filename=questions.csv'},
+            direct_passthrough=True
         )
-
-        end_time = time.time()
-        duration = round(end_time - start_time, 2)
-        logger.info(f"导出题库数据成功 | 总计 {len(records)} 条记录 | 耗时 {duration} 秒")
-        return response
     except Exception as e:
         end_time = time.time()
         duration = round(end_time - start_time, 2)
@@ -236,43 +504,27 @@ def import_questions():
             return jsonify({'success': False, 'message': '只支持导入CSV文件'}), 400
 
         logger.info(f"开始处理CSV文件: {file.filename}")
-        import csv
-        import io
-        stream = io.StringIO(file.stream.read().decode('utf-8'))
-        reader = csv.reader(stream)
+        # 边读边解码，不把整个上传文件读进内存；newline='' 交给 csv 处理引号内的换行，
+        # utf-8-sig 去掉 Excel 导出的 BOM
+        reader = csv.reader(io.TextIOWrapper(
+            io.BufferedReader(_UploadStream(file.stream)), encoding='utf-8-sig', newline=''
+        ))
         next(reader)
         imported_count = 0
         error_count = 0
-        for row in reader:
-            try:
-                if len(row) < 5:
-                    error_count += 1
-                    continue
-                question = row[1].strip()
-                question_type = row[2].strip() if row[2].strip() != '未知' else None
-                options = row[3].strip()
-                answer = row[4].strip()
-                existing = g.db.query(QARecord).filter(
-                    QARecord.question == question,
-                    QARecord.type == question_type,
-                    QARecord.options == options
-                ).first()
-                if existing:
-                    existing.answer = answer
-                    existing.created_at = datetime.now()
-                else:
-                    qa_record = QARecord(
-                        question=question,
-                        type=question_type,
-                        options=options,
-                        answer=answer,
-                        created_at=datetime.now()
-                    )
-                    g.db.add(qa_record)
-                imported_count += 1
-            except Exception as e:
-                error_count += 1
+        # 同一批导入的记录共用一个时间戳
+        now = datetime.now()
+        # 按块读取、查重、批量写入，内存只保留一个块；前面块写入的记录在同一事务内，
+        # 后续块的预取查询能看到它们，跨块重复的题目会走更新分支
+        while True:
+            rows = list(itertools.islice(reader, IMPORT_CHUNK_SIZE))
+            if not rows:
+                break
+            chunk_imported, chunk_errors = _import_csv_chunk(g.db, rows, now)
+            imported_count += chunk_imported
+            error_count += chunk_errors
         g.db.commit()
+        invalidate_type_counts()
         end_time = time.time()
         duration = round(end_time - start_time, 2)
         logger.info(f"CSV导入完成: 成功 {imported_count} 条, 失败 {error_count} 条 | 耗时 {duration} 秒")
@@ -301,24 +553,38 @@ def batch_delete_questions():
             return jsonify({'success': False, 'message': '未提供要删除的记录ID'}), 400
 
         logger.info(f"尝试删除 {len(record_ids)} 条记录, IDs: {record_ids[:5]}...")
-        records = g.db.query(QARecord).filter(QARecord.id.in_(record_ids)).all()
+        # 去重后分块，每块的 IN 列表长度有上限，所有块在同一事务中执行
+        record_ids = list(dict.fromkeys(record_ids))
+        id_chunks = [record_ids[i:i + DELETE_CHUNK_SIZE] for i in range(0, len(record_ids), DELETE_CHUNK_SIZE)]
 
-        if not records:
+        # 记录删除的题目类型分布，由数据库聚合，不加载任何记录行
+        type_counts = {}
+        for chunk in id_chunks:
+            type_stats = g.db.query(
+                QARecord.type,
+                func.count(QARecord.id)
+            ).filter(QARecord.id.in_(chunk)).group_by(QARecord.type)
+            for record_type, count in type_stats:
+                record_type = record_type or '未知'
+                type_counts[record_type] = type_counts.get(record_type, 0) + count
+
+        if not type_counts:
             logger.warning(f"未找到要删除的记录, IDs: {record_ids}")
             return jsonify({'success': False, 'message': '未找到要删除的记录'}), 404
 
-        # 记录删除的题目类型分布
-        type_counts = {}
-        for record in records:
-            record_type = record.type or '未知'
-            type_counts[record_type] = type_counts.get(record_type, 0) + 1
-            g.db.delete(record)
+        # 每块一条 DELETE ... WHERE id IN (...)
+        deleted_count = 0
+        for chunk in id_chunks:
+            deleted_count += g.db.query(QARecord).filter(
+                QARecord.id.in_(chunk)
+            ).delete(synchronize_session=False)
 
         g.db.commit()
+        invalidate_type_counts()
         end_time = time.time()
         duration = round(end_time - start_time, 2)
-        logger.info(f"批量删除成功: 共 {len(records)} 条记录 | 类型分布: {type_counts} | 耗时 {duration} 秒")
-        return jsonify({'success': True, 'message': f'成功删除{len(records)}条记录'})
+        logger.info(f"批量删除成功: 共 {deleted_count} 条记录 | 类型分布: {type_counts} | 耗时 {duration} 秒")
+        return jsonify({'success': True, 'message': f'成功删除{deleted_count}条记录'})
     except Exception as e:
         end_time = time.time()
         duration = round(end_time - start_time, 2)
@@ -475,30 +741,10 @@ def api_update_view_count(question_id):
             'message': f'操作失败: {str(e)}'
         }), 500
 
-@questions_bp.route('/api/questions/add', methods=['POST', 'OPTIONS'])
+# OPTIONS 预检由 Flask 自动应答，CORS 头由应用级 flask_cors 统一添加，不进入视图
+@questions_bp.route('/api/questions/add', methods=['POST'])
 def add_single_record():
     """单个题目录入接口"""
-    # 如果是OPTIONS请求，直接返回空响应与必要的CORS头
-    if request.method == 'OPTIONS':
-        response = jsonify({})
-        # 获取请求的Origin头
-        origin = request.headers.get('Origin', '')
-        # 允许的来源列表
-        allowed_origins = ["https://mooc2-ans.chaoxing.com", "http://localhost:8080", "http://127.0.0.1:8080"]
-
-        # 如果请求的Origin在允许列表中，则设置对应的头
-        if origin in allowed_origins:
-            response.headers.add('Access-Control-Allow-Origin', origin)
-            response.headers.add('Access-Control-Allow-Credentials', 'true')
-        else:
-            # 如果不在允许列表中，使用默认的第一个来源
-            response.headers.add('Access-Control-Allow-Origin', allowed_origins[0])
-
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Authorization, X-Requested-With')
-        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        response.headers.add('Access-Control-Max-Age', '600')
-        return response
-
     start_time = time.time()
     client_ip = request.remote_addr
     user_agent = request.headers.get('User-Agent', '未知')
@@ -522,66 +768,71 @@ def add_single_record():
             error_count = 0
             skip_count = 0  # 跳过的重复题目计数
 
-            # 使用集合记录已处理的题目特征，避免重复处理
-            processed_questions = set()
-
+            # 先清洗、校验全部题目并按题目特征去重，同一特征以最后出现的答案为准
+            by_sig = {}
             for item in questions_data:
                 question = item.get('question', '')
                 # 清理题目前缀
                 question = clean_question_prefix(question)
                 question_type = item.get('type', '')
-                options = item.get('options', '')
+                options = item.get('options') or ''
                 answer = item.get('answer', '')
 
                 if not question or not question_type or not answer:
                     error_count += 1
                     continue
-
-                # 创建题目特征码，用于检测当前批次中的重复题目
-                question_signature = f"{question}|{question_type}|{options}"
-
-                # 检查是否在当前批次中已处理过相同的题目
-                if question_signature in processed_questions:
+                question_signature = dedupe_key(question, question_type, options)
+                if question_signature in by_sig:
+                    # 当前批次中的重复题目，后出现的覆盖先出现的
                     skip_count += 1
-                    logger.info(f"跳过重复题目: {question[:30]}...")
-                    continue
+                by_sig[question_signature] = (question, question_type, options, answer)
+
+            # 一次性预取库中已有的同题干记录，循环内只做字典查找
+            existing_index = load_existing_records(db_session, (item[0] for item in by_sig.values()))
+            new_rows = []
+            updates = {}
 
-                # 添加到已处理集合
-                processed_questions.add(question_signature)
+            # 同一批导入的记录共用一个时间戳
+            now = datetime.now()
+            # 逐题日志只在 DEBUG 级别输出，判断一次即可
+            debug_enabled = logger.isEnabledFor(logging.DEBUG)
 
-                # 查重：如已存在则更新，否则插入
-                existing = db_session.query(QARecord).filter(
-                    QARecord.question == question,
-                    QARecord.type == question_type,
-                    QARecord.options == options
-                ).first()
+            for question_signature, (question, question_type, options, answer) in by_sig.items():
+                existing = existing_index.get(question_signature)
 
                 if existing:
                     # 检查答案是否相同，如果相同则不需要更新
-                    if existing.answer == answer:
+                    if existing['answer'] == answer:
                         skip_count += 1
-                        logger.info(f"跳过数据库中已存在的相同题目: {question[:30]}...")
+                        if debug_enabled:
+                            logger.debug(f"跳过数据库中已存在的相同题目: {question[:30]}...")
                         continue
 
                     # 答案不同，更新答案
-                    existing.answer = answer
-                    existing.created_at = datetime.now()
-                    logger.info(f"更新已存在题目的答案: {question[:30]}...")
+                    existing['answer'] = answer
+                    existing['created_at'] = now
+                    updates[existing['id']] = existing
+                    if debug_enabled:
+                        logger.debug(f"更新已存在题目的答案: {question[:30]}...")
                 else:
-                    # 新题目，添加到数据库
-                    qa_record = QARecord(
-                        question=question,
-                        type=question_type,
-                        options=options,
-                        answer=answer,
-                        created_at=datetime.now()
-                    )
-                    db_session.add(qa_record)
-                    logger.info(f"添加新题目: {question[:30]}...")
+                    # 新题目，攒到最后批量插入
+                    new_rows.append({
+                        'question': question,
+                        'type': question_type,
+                        'options': options,
+                        'answer': answer,
+                        'created_at': now
+                    })
+                    if debug_enabled:
+                        logger.debug(f"添加新题目: {question[:30]}...")
 
                 success_count += 1
 
+            insert_new_records(db_session, new_rows)
+            db_session.bulk_update_mappings(QARecord, list(updates.values()))
             db_session.commit()
+            invalidate_type_counts()
+            logger.info(f"批量录入完成: 新增={len(new_rows)}, 更新={len(updates)}, 跳过={skip_count}, 格式错误={error_count}")
             message = f'成功导入 {success_count} 道题目'
             if skip_count > 0:
                 message += f', 跳过 {skip_count} 道重复题目'
@@ -593,84 +844,37 @@ def add_single_record():
             # 清理题目前缀
             question = clean_question_prefix(question)
             question_type = data.get('type', '')
-            options = data.get('options', '')
+            options = data.get('options') or ''
             answer = data.get('answer', '')
 
             if not question or not question_type or not answer:
                 return jsonify({'success': False, 'message': '缺少必要字段（题目、类型、答案）'}), 400
 
             # 查重：如已存在则更新，否则插入
-            existing = db_session.query(QARecord).filter(
-                QARecord.question == question,
-                QARecord.type == question_type,
-                QARecord.options == options
-            ).first()
-
-            if existing:
-                existing.answer = answer
-                existing.created_at = datetime.now()
+            if save_single_record(db_session, question, question_type, options, answer):
                 message = '题目已存在，已更新答案'
             else:
-                qa_record = QARecord(
-                    question=question,
-                    type=question_type,
-                    options=options,
-                    answer=answer,
-                    created_at=datetime.now()
-                )
-                db_session.add(qa_record)
                 message = '题目已成功录入'
 
-            # 事务已在各自的分支中提交
+            db_session.commit()
+            invalidate_type_counts()
 
         # 记录处理时间
         process_time = time.time() - start_time
         logger.info(f"单个题目录入完成 (耗时: {process_time:.2f}秒)")
 
-        # 创建响应并添加CORS头
-        response = jsonify({
+        # CORS头由 flask_cors 统一添加
+        return jsonify({
             'success': True,
             'message': message
         })
 
-        # 获取请求的Origin头
-        origin = request.headers.get('Origin', '')
-        # 允许的来源列表
-        allowed_origins = ["https://mooc2-ans.chaoxing.com", "http://localhost:8080", "http://127.0.0.1:8080"]
-
-        # 如果请求的Origin在允许列表中，则设置对应的头
-        if origin in allowed_origins:
-            response.headers.add('Access-Control-Allow-Origin', origin)
-            response.headers.add('Access-Control-Allow-Credentials', 'true')
-        else:
-            # 如果不在允许列表中，使用默认的第一个来源
-            response.headers.add('Access-Control-Allow-Origin', allowed_origins[0])
-
-        return response
-
     except Exception as e:
         logger.error(f"录入单个题目时发生错误: {str(e)}", exc_info=True)
-        # 创建错误响应并添加CORS头
-        response = jsonify({
+        return jsonify({
             'success': False,
             'message': f'发生错误: {str(e)}'
-        })
-
-        # 获取请求的Origin头
-        origin = request.headers.get('Origin', '')
-        # 允许的来源列表
-        allowed_origins = ["https://mooc2-ans.chaoxing.com", "http://localhost:8080", "http://127.0.0.1:8080"]
-
-        # 如果请求的Origin在允许列表中，则设置对应的头
-        if origin in allowed_origins:
-            response.headers.add('Access-Control-Allow-Origin', origin)
-            response.headers.add('Access-Control-Allow-Credentials', 'true')
-        else:
-            # 如果不在允许列表中，使用默认的第一个来源
-            response.headers.add('Access-Control-Allow-Origin', allowed_origins[0])
-
-        response.status_code = 500
-        return response
+        }), 500
 
 @questions_bp.route('/api/import_questions', methods=['POST'])
 # 移除登录限制，允许外部系统和脚本直接调用
@@ -706,17 +910,15 @@ def import_questions_json():
             return jsonify({'success': False, 'message': '题目数组为空或格式不正确'}), 400
         logger.info(f"收到题目数量: {len(questions)}")
 
-        # 验证题型
-        valid_types = ['single', 'multiple', 'judgement', 'completion', 'short', 'essay', 'calculation', 'analysis', 'case', 'matching']
-
         # 统计题型数量
         type_counts = {}
         for item in questions:
             q_type = item.get('type', '未知')
-            # 确保题型有效
-            if q_type not in valid_types and q_type != '未知':
-                logger.warning(f"发现未知题型: {q_type}，将使用原始值")
             type_counts[q_type] = type_counts.get(q_type, 0) + 1
+        # 按题型汇总告警，不再逐题输出
+        unknown_types = [t for t in type_counts if t not in VALID_TYPES and t != '未知']
+        if unknown_types:
+            logger.warning(f"发现未知题型: {unknown_types}，将使用原始值")
         logger.info(f"题型分布: {type_counts}")
 
         imported_count = 0
@@ -725,6 +927,18 @@ def import_questions_json():
 
         # 处理题目导入
         try:
+            # 一次性预取库中已有的同题干记录，循环内只做字典查找
+            existing_index = load_existing_records(
+                db_session,
+                (item.get('question', '').strip() for item in questions if isinstance(item.get('question'), str))
+            )
+            new_rows = []
+            updates = {}
+            # 同一批导入的记录共用一个时间戳
+            now = datetime.now()
+            # 逐题日志只在 DEBUG 级别输出，判断一次即可
+            debug_enabled = logger.isEnabledFor(logging.DEBUG)
+
             for idx, item in enumerate(questions):
                 try:
                     question = item.get('question', '').strip()
@@ -732,101 +946,61 @@ def import_questions_json():
                     options = item.get('options', '').strip()
                     answer = item.get('answer', '').strip()
 
-                    # 记录题目信息摘要
-                    question_summary = question[:30] + '...' if len(question) > 30 else question
-                    logger.debug(f"处理第{idx+1}题: 类型={question_type}, 题干={question_summary}")
+                    if debug_enabled:
+                        question_summary = question[:30] + '...' if len(question) > 30 else question
+                        logger.debug(f"处理第{idx+1}题: 类型={question_type}, 题干={question_summary}")
 
                     if not question or not answer:
-                        logger.warning(f"第{idx+1}题缺少题干或答案，已跳过")
+                        if debug_enabled:
+                            logger.debug(f"第{idx+1}题缺少题干或答案，已跳过")
                         error_count += 1
                         continue
 
-                    # 使用try-except包裹查询操作，防止查询异常
-                    try:
-                        existing = db_session.query(QARecord).filter(
-                            QARecord.question == question,
-                            QARecord.type == question_type,
-                            QARecord.options == options
-                        ).first()
-                    except Exception as query_error:
-                        logger.error(f"查询第{idx+1}题时出错: {str(query_error)}")
-                        db_session.rollback()
-                        error_count += 1
-                        continue
+                    key = dedupe_key(question, question_type, options)
+                    existing = existing_index.get(key)
 
                     if existing:
-                        # 检查所有属性是否完全一致
-                        if (existing.question == question and
-                            existing.type == question_type and
-                            existing.options == options and
-                            existing.answer == answer):
-                            # 完全相同的题目，直接跳过
-                            logger.debug(f"第{idx+1}题已存在，ID={existing.id}，完全一致，跳过处理")
+                        # 题干、类型、选项已由查重键保证一致，只需比较答案
+                        if existing['answer'] == answer:
+                            if debug_enabled:
+                                logger.debug(f"第{idx+1}题已存在，ID={existing.get('id', '待插入')}，完全一致，跳过处理")
                             continue
 
-                        # 检查答案是否一致，如果只有答案不同，才更新答案
-                        if existing.answer != answer:
-                            logger.info(f"第{idx+1}题已存在，ID={existing.id}，答案不同，更新答案")
-                            existing.answer = answer
-                            existing.created_at = datetime.now()
-                            updated_count += 1
-                        else:
-                            # 答案一致但其他属性有变化，更新其他属性
-                            changes = []
-                            if existing.question != question:
-                                existing.question = question
-                                changes.append('题干')
-                            if existing.type != question_type:
-                                existing.type = question_type
-                                changes.append('类型')
-                            if existing.options != options:
-                                existing.options = options
-                                changes.append('选项')
-
-                            if changes:
-                                logger.info(f"第{idx+1}题已存在，ID={existing.id}，更新了{', '.join(changes)}")
-                                existing.created_at = datetime.now()
-                                updated_count += 1
-                            else:
-                                # 这种情况不应该发生，因为前面的完全一致检查应该已经跳过了
-                                logger.warning(f"第{idx+1}题已存在，ID={existing.id}，逻辑错误，没有变化但未被跳过")
-                                continue
+                        if debug_enabled:
+                            logger.debug(f"第{idx+1}题已存在，ID={existing.get('id', '待插入')}，答案不同，更新答案")
+                        existing['answer'] = answer
+                        existing['created_at'] = now
+                        if 'id' in existing:
+                            updates[existing['id']] = existing
+                        updated_count += 1
                     else:
-                        logger.info(f"第{idx+1}题为新题目，添加到数据库")
-                        qa_record = QARecord(
-                            question=question,
-                            type=question_type,
-                            options=options,
-                            answer=answer,
-                            created_at=datetime.now()
-                        )
-                        db_session.add(qa_record)
+                        if debug_enabled:
+                            logger.debug(f"第{idx+1}题为新题目，添加到数据库")
+                        new_row = {
+                            'question': question,
+                            'type': question_type,
+                            'options': options,
+                            'answer': answer,
+                            'created_at': now
+                        }
+                        new_rows.append(new_row)
+                        # 同一批次内的重复题目更新刚加入的记录
+                        existing_index[key] = new_row
 
                     imported_count += 1
 
-                    # 每处理一定数量的题目后进行一次提交，减少单次事务的大小
-                    if (idx + 1) % 10 == 0:
-                        try:
-                            db_session.commit()
-                            logger.debug(f"已提交前 {idx+1} 题的修改")
-                        except Exception as commit_error:
-                            logger.error(f"提交事务时出错: {str(commit_error)}")
-                            db_session.rollback()
-                            error_count += 1
-
                 except Exception as e:
+                    # 循环内不访问数据库，单题出错只计数，不回滚整个事务
                     logger.error(f"处理第{idx+1}题时出错: {str(e)}")
                     error_count += 1
-                    # 确保当前事务状态正常
-                    try:
-                        db_session.rollback()
-                    except:
-                        pass
 
-            # 最终提交所有修改
+            # 最终一次性批量写入并提交所有修改
             try:
+                insert_new_records(db_session, new_rows)
+                db_session.bulk_update_mappings(QARecord, list(updates.values()))
                 db_session.commit()
-                logger.info(f"所有修改已提交到数据库")
+                invalidate_type_counts()
+                logger.info(f"所有修改已提交到数据库: 新增={len(new_rows)}, 更新={len(updates)}")
             except Exception as final_commit_error:
                 logger.error(f"最终提交时出错: {str(final_commit_error)}")
                 db_session.rollback()
@@ -871,7 +1045,7 @@ def get_question_detail(question_id):
     client_ip = request.remote_addr
     logger.info(f"查询题目详情 ID={question_id} | IP={client_ip}")
 
-    record = g.db.query(QARecord).filter(QARecord.id == question_id).first()
+    record = g.db.get(QARecord, question_id)
     if not record:
         logger.warning(f"未找到题目 ID={question_id}")
         return jsonify({'success': False, 'message': '未找到该题目'}), 404
@@ -899,7 +1073,7 @@ def update_question(question_id):
     user_agent = request.headers.get('User-Agent', '未知')
     logger.info(f"开始更新题目 ID={question_id} | IP={client_ip} | User-Agent={user_agent}")
 
-    record = g.db.query(QARecord).filter(QARecord.id == question_id).first()
+    record = g.db.get(QARecord, question_id)
     if not record:
         logger.warning(f"更新失败: 未找到题目 ID={question_id}")
         return jsonify({'success': False, 'message': '未找到该题目'}), 404
@@ -916,7 +1090,14 @@ def update_question(question_id):
     record.answer = data.get('answer', record.answer)
     record.created_at = datetime.now()
 
-    g.db.commit()
+    try:
+        g.db.commit()
+    except IntegrityError:
+        # 修改后与另一道题目的题干、类型、选项完全相同，违反 uq_qa_sig 唯一索引
+        g.db.rollback()
+        logger.warning(f"更新失败: 题目 ID={question_id} 修改后与已有题目重复")
+        return jsonify({'success': False, 'message': '已存在相同的题目（题干、类型、选项一致），未保存修改'}), 409
+    invalidate_type_counts()
     end_time = time.time()
     duration = round(end_time - start_time, 2)
 
@@ -933,7 +1114,10 @@ def delete_question(question_id):
     user_agent = request.headers.get('User-Agent', '未知')
     logger.info(f"开始删除题目 ID={question_id} | IP={client_ip} | User-Agent={user_agent}")
 
-    record = g.db.query(QARecord).filter(QARecord.id == question_id).first()
+    # 只加载日志需要的列，不读取答案、选项等大字段
+    record = g.db.query(QARecord).options(
+        load_only(QARecord.id, QARecord.type, QARecord.question)
+    ).filter(QARecord.id == question_id).first()
     if not record:
         logger.warning(f"删除失败: 未找到题目 ID={question_id}")
         return jsonify({'success': False, 'message': '未找到该题目'}), 404
@@ -944,5 +1128,6 @@ def delete_question(question_id):
 
     g.db.delete(record)
     g.db.commit()
+    invalidate_type_counts()
     logger.info(f"题目删除成功: ID={question_id}")
     return jsonify({'success': True, 'message': '题目删除成功'})
\ No newline at end of file
@@ -1,10 +1,24 @@
+import copy
 import json
 import os
+import threading
+from contextlib import contextmanager
 from flask import Blueprint, render_template, request, session, redirect
 from datetime import datetime
 from functools import wraps
 # provider 相关导入已移除
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 下没有 fcntl，只做进程内互斥
+    fcntl = None
+
 CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.json')
 
 def login_required(view_func):
@@ -27,13 +41,64 @@ def admin_required(view_func):
 
 settings_bp = Blueprint('settings', __name__)
 
-def load_config():
-    with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-        return json.load(f)
+# 已解析配置的缓存，按文件 (mtime, inode, size) 失效，命中时只需一次 stat()
+# save_config 用 os.replace 写入，每次写入都会换新 inode，同一时钟刻度内的两次写入也能区分
+_config_cache = {'stamp': None, 'data': None}
+
+def _config_stamp(stat_result):
+    return stat_result.st_mtime_ns, stat_result.st_ino, stat_result.st_size
+_config_lock = threading.Lock()
+
+def load_config(readonly=False):
+    """读取 config.json；readonly=True 时直接返回缓存对象，调用方不得修改"""
+    stamp = _config_stamp(os.stat(CONFIG_PATH))
+    if stamp != _config_cache['stamp']:
+        with _config_lock:
+            if stamp != _config_cache['stamp']:
+                with open(CONFIG_PATH, 'rb') as f:
+                    # 以实际读到的文件为准，避免 stat 与 open 之间文件被替换
+                    stamp = _config_stamp(os.fstat(f.fileno()))
+                    raw = f.read()
+                _config_cache['data'] = orjson.loads(raw) if orjson else json.loads(raw)
+                _config_cache['stamp'] = stamp
+    if readonly:
+        return _config_cache['data']
+    # 调用方会就地修改配置，返回副本以免污染缓存
+    return copy.deepcopy(_config_cache['data'])
+
+# 串行化 config.json 的 读取-修改-写入，防止并发修改互相覆盖
+_config_write_lock = threading.Lock()
+
+@contextmanager
+def config_write_lock():
+    """进程内用线程锁、跨进程用 flock 保护整个 load_config → 修改 → save_config 过程"""
+    with _config_write_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(CONFIG_PATH + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
 
 def save_config(config):
-    with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-        json.dump(config, f, indent=4, ensure_ascii=False)
+    # 先整体序列化再一次写入临时文件，os.replace 原子替换，读者不会看到写了一半的文件
+    if orjson:
+        buf = orjson.dumps(config, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    else:
+        buf = json.dumps(config, indent=2, ensure_ascii=False).encode('utf-8')
+    tmp_path = CONFIG_PATH + '.tmp'
+    with open(tmp_path, 'wb', buffering=1 << 16) as f:
+        f.write(buf)
+        # 落盘后再替换，避免崩溃后留下空文件
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, CONFIG_PATH)
+    with _config_lock:
+        _config_cache['data'] = copy.deepcopy(config)
+        _config_cache['stamp'] = _config_stamp(os.stat(CONFIG_PATH))
 
 @settings_bp.route('/settings', methods=['GET', 'POST'])
 @login_required
@@ -58,32 +123,35 @@ def settings():
             # 只允许编辑 third_party_apis、cache、database、redis、record
             # 注意：第三方API代理池配置现在是只读的，需要直接编辑config.json
             # 这里保持向后兼容，但实际上不会修改数组结构
-            # cache
-            cache = config.get('cache', {})
-            cache['enable'] = request.form.get('cache_enable') == 'on'
-            cache['expiration'] = int(request.form.get('cache_expiration', cache.get('expiration', 2592000)))
-            config['cache'] = cache
-            # database
-            database = config.get('database', {})
-            database['host'] = request.form.get('db_host', database.get('host', ''))
-            database['port'] = int(request.form.get('db_port', database.get('port', 3306)))
-            database['user'] = request.form.get('db_user', database.get('user', ''))
-            database['password'] = request.form.get('db_password', database.get('password', ''))
-            database['name'] = request.form.get('db_name', database.get('name', ''))
-            config['database'] = database
-            # redis
-            redis = config.get('redis', {})
-            redis['enabled'] = request.form.get('redis_enabled') == 'on'
-            redis['host'] = request.form.get('redis_host', redis.get('host', ''))
-            redis['port'] = int(request.form.get('redis_port', redis.get('port', 6379)))
-            redis['password'] = request.form.get('redis_password', redis.get('password', ''))
-            redis['db'] = int(request.form.get('redis_db', redis.get('db', 0)))
-            config['redis'] = redis
-            # record
-            record = config.get('record', {})
-            record['enable'] = request.form.get('record_enable') == 'on'
-            config['record'] = record
-            save_config(config)
+            with config_write_lock():
+                # 在锁内重新读取，避免覆盖其他请求刚写入的修改
+                config = load_config()
+                # cache
+                cache = config.get('cache', {})
+                cache['enable'] = request.form.get('cache_enable') == 'on'
+                cache['expiration'] = int(request.form.get('cache_expiration', cache.get('expiration', 2592000)))
+                config['cache'] = cache
+                # database
+                database = config.get('database', {})
+                database['host'] = request.form.get('db_host', database.get('host', ''))
+                database['port'] = int(request.form.get('db_port', database.get('port', 3306)))
+                database['user'] = request.form.get('db_user', database.get('user', ''))
+                database['password'] = request.form.get('db_password', database.get('password', ''))
+                database['name'] = request.form.get('db_name', database.get('name', ''))
+                config['database'] = database
+                # redis
+                redis = config.get('redis', {})
+                redis['enabled'] = request.form.get('redis_enabled') == 'on'
+                redis['host'] = request.form.get('redis_host', redis.get('host', ''))
+                redis['port'] = int(request.form.get('redis_port', redis.get('port', 6379)))
+                redis['password'] = request.form.get('redis_password', redis.get('password', ''))
+                redis['db'] = int(request.form.get('redis_db', redis.get('db', 0)))
+                config['redis'] = redis
+                # record
+                record = config.get('record', {})
+                record['enable'] = request.form.get('record_enable') == 'on'
+                config['record'] = record
+                save_config(config)
             success = request.args.get('success', False)
             message = request.args.get('message', '')
 
@@ -55,9 +55,11 @@ class KeySwitcher:
 
     def save_config(self, config):
         """保存配置文件"""
+        # 与设置页面等其他写入方共用同一把锁，原子替换写回
+        from routes.settings import save_config, config_write_lock
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=4, ensure_ascii=False)
+            with config_write_lock():
+                save_config(config)
             logger.info("配置文件保存成功")
             return True
         except Exception as e:
@@ -202,40 +202,45 @@ class ModelHealthChecker:
 
         unhealthy_model_names = [m['model'] for m in self.unhealthy_models]
 
-        # 找到第一个激活的第三方API配置
-        third_party_apis = self.config.get('third_party_apis', [])
-        primary_api = None
-        for api in third_party_apis:
-            if api.get('is_active', True):
-                primary_api = api
-                break
-
-        if not primary_api and third_party_apis:
-            primary_api = third_party_apis[0]
-
-        if not primary_api:
-            self.logger.error("未找到第三方API配置")
-            return False
-
-        original_count = len(primary_api['models'])
-
-        # 移除不健康的模型
-        primary_api['models'] = [
-            model for model in primary_api['models']
-            if model not in unhealthy_model_names
-        ]
-
-        # 如果当前默认模型不健康，切换到健康的模型
-        current_model = primary_api['model']
-        if current_model in unhealthy_model_names and self.healthy_models:
-            new_model = self.healthy_models[0]['model']
-            primary_api['model'] = new_model
-            self.logger.warning(f"默认模型已从 {current_model} 切换到 {new_model}")
-
-        # 保存更新的配置
+        # 与设置页面等其他写入方共用同一把锁，在锁内重新读取最新配置再修改，原子替换写回
+        from routes.settings import load_config, save_config, config_write_lock
         try:
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=4)
+            with config_write_lock():
+                config = load_config()
+
+                # 找到第一个激活的第三方API配置
+                third_party_apis = config.get('third_party_apis', [])
+                primary_api = None
+                for api in third_party_apis:
+                    if api.get('is_active', True):
+                        primary_api = api
+                        break
+
+                if not primary_api and third_party_apis:
+                    primary_api = third_party_apis[0]
+
+                if not primary_api:
+                    self.logger.error("未找到第三方API配置")
+                    return False
+
+                original_count = len(primary_api['models'])
+
+                # 移除不健康的模型
+                primary_api['models'] = [
+                    model for model in primary_api['models']
+                    if model not in unhealthy_model_names
+                ]
+
+                # 如果当前默认模型不健康，切换到健康的模型
+                current_model = primary_api['model']
+                if current_model in unhealthy_model_names and self.healthy_models:
+                    new_model = self.healthy_models[0]['model']
+                    primary_api['model'] = new_model
+                    self.logger.warning(f"默认模型已从 {current_model} 切换到 {new_model}")
+
+                # 保存更新的配置
+                save_config(config)
+                self.config = config
 
             removed_count = original_count - len(primary_api['models'])
             self.logger.info(f"配置已更新，移除了 {removed_count} 个不健康的模型")
@@ -16,6 +16,15 @@ from config.config import Config
 
 logger = logging.getLogger(__name__)
 
+# 支持游标（keyset）分页的排序字段，均为非空且可与 id 组成稳定顺序
+KEYSET_SORT_FIELDS = ('id', 'created_at')
+
+# 题库列表页实际渲染的列，compact 模式只查询这些列，不构造 ORM 对象
+LIST_COLUMNS = (
+    QARecord.id, QARecord.question, QARecord.type, QARecord.options, QARecord.answer,
+    QARecord.created_at, QARecord.is_favorite, QARecord.view_count, QARecord.difficulty
+)
+
 class SearchService:
     """高级搜索服务"""
     
@@ -36,7 +45,10 @@ class SearchService:
                        sort_by: str = "created_at",
                        sort_order: str = "desc",
                        page: int = 1,
-                       per_page: int = 10) -> Dict[str, Any]:
+                       per_page: int = 10,
+                       cursor_id: Optional[int] = None,
+                       compact: bool = False,
+                       include_total: bool = True) -> Dict[str, Any]:
         """
         高级搜索功能
         
@@ -53,6 +65,9 @@ class SearchService:
             sort_order: 排序方向
             page: 页码
             per_page: 每页数量
+            cursor_id: 上一页最后一条记录的ID，提供时按游标翻页而不使用 OFFSET
+            compact: 只返回列表页需要的字段，跳过 ORM 对象构造
+            include_total: 是否统计总数；为 False 时 total/pages 返回 None，只靠 next_cursor 翻页
             
         Returns:
             搜索结果字典
@@ -102,24 +117,41 @@ class SearchService:
             if is_favorite is not None:
                 base_query = base_query.filter(QARecord.is_favorite == is_favorite)
             
-            # 获取总数
-            total_count = base_query.count()
+            # 获取总数：直接 SELECT count(id)，不带排序也不包子查询，便于走索引
+            # 大表上 COUNT 是最慢的一步，调用方不需要总页数时跳过
+            total_count = None
+            if include_total:
+                total_count = base_query.with_entities(func.count(QARecord.id)).order_by(None).scalar() or 0
             
-            # 排序
+            # 排序，非 id 排序时追加 id 作为次序键，保证游标翻页顺序稳定
             sort_column = getattr(QARecord, sort_by, QARecord.created_at)
-            if sort_order.lower() == "desc":
-                base_query = base_query.order_by(sort_column.desc())
-            else:
-                base_query = base_query.order_by(sort_column.asc())
+            descending = sort_order.lower() == "desc"
+            order_columns = [sort_column] if sort_column is QARecord.id else [sort_column, QARecord.id]
+            base_query = base_query.order_by(
+                *[column.desc() if descending else column.asc() for column in order_columns]
+            )
+            
+            if compact:
+                base_query = base_query.with_entities(*LIST_COLUMNS)
             
-            # 分页
-            offset = (page - 1) * per_page
-            records = base_query.offset(offset).limit(per_page).all()
+            # 分页：有游标时从上一页最后一条记录之后继续扫描索引，否则退回 OFFSET 跳页
+            seek_condition = None
+            if cursor_id and sort_by in KEYSET_SORT_FIELDS:
+                seek_condition = self._keyset_condition(db_session, sort_column, cursor_id, descending)
+            # 多取一条判断是否还有下一页，不依赖总数
+            if seek_condition is not None:
+                records = base_query.filter(seek_condition).limit(per_page + 1).all()
+            else:
+                offset = (page - 1) * per_page
+                records = base_query.offset(offset).limit(per_page + 1).all()
+            has_more = len(records) > per_page
+            records = records[:per_page]
+            next_cursor = records[-1].id if has_more else None
             
             # 转换为字典并添加高亮
             results = []
             for record in records:
-                record_dict = record.to_dict()
+                record_dict = self._list_row_to_dict(record) if compact else record.to_dict()
                 if query.strip():
                     record_dict = self._highlight_keywords(record_dict, query)
                 results.append(record_dict)
@@ -135,7 +167,8 @@ class SearchService:
                     'page': page,
                     'per_page': per_page,
                     'total': total_count,
-                    'pages': (total_count + per_page - 1) // per_page
+                    'pages': (total_count + per_page - 1) // per_page if total_count is not None else None,
+                    'next_cursor': next_cursor
                 },
                 'search_info': {
                     'query': query,
@@ -158,6 +191,35 @@ class SearchService:
                 'pagination': {'page': page, 'per_page': per_page, 'total': 0, 'pages': 0}
             }
     
+    def _keyset_condition(self, db_session: Session, sort_column, cursor_id: int, descending: bool):
+        """构造游标翻页条件：(sort_column, id) 严格位于游标记录之后"""
+        if sort_column is QARecord.id:
+            return QARecord.id < cursor_id if descending else QARecord.id > cursor_id
+        
+        cursor_value = db_session.query(sort_column).filter(QARecord.id == cursor_id).scalar()
+        if cursor_value is None:
+            # 游标记录已被删除，交给 OFFSET 分页处理
+            return None
+        if descending:
+            return or_(sort_column < cursor_value,
+                       and_(sort_column == cursor_value, QARecord.id < cursor_id))
+        return or_(sort_column > cursor_value,
+                   and_(sort_column == cursor_value, QARecord.id > cursor_id))
+    
+    def _list_row_to_dict(self, row) -> Dict[str, Any]:
+        """把 LIST_COLUMNS 查询出的行转换为列表页使用的字典，字段含义与 QARecord.to_dict 一致"""
+        return {
+            'id': row.id,
+            'question': row.question,
+            'type': row.type,
+            'options': row.options,
+            'answer': row.answer,
+            'time': row.created_at.isoformat(sep=' ', timespec='seconds') if row.created_at else None,
+            'is_favorite': row.is_favorite or False,
+            'view_count': row.view_count or 0,
+            'difficulty': row.difficulty or 'medium'
+        }
+    
     def _parse_search_query(self, query: str) -> List[str]:
         """解析搜索查询，支持引号包围的短语和多关键词"""
         # 处理引号包围的短语
@@ -266,7 +328,7 @@ class SearchService:
     def toggle_favorite(self, db_session: Session, question_id: int) -> Dict[str, Any]:
         """切换题目收藏状态"""
         try:
-            record = db_session.query(QARecord).filter(QARecord.id == question_id).first()
+            record = db_session.get(QARecord, question_id)
             if not record:
                 return {'success': False, 'message': '题目不存在'}
             
@@ -287,7 +349,7 @@ class SearchService:
     def update_view_count(self, db_session: Session, question_id: int):
         """更新题目查看次数"""
         try:
-            record = db_session.query(QARecord).filter(QARecord.id == question_id).first()
+            record = db_session.get(QARecord, question_id)
             if record:
                 record.view_count = (record.view_count or 0) + 1
                 record.last_viewed = func.now()
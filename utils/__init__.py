@@ -15,7 +15,9 @@ from .utils import (
     format_answer_for_ocs,
     parse_question_and_options,
     extract_answer,
-    SimpleCache
+    SimpleCache,
+    cached_response,
+    clear_response_cache
 )
 from .logger import app_logger
 from .auth import login_required, admin_required
@@ -26,6 +28,8 @@ __all__ = [
     'parse_question_and_options',
     'extract_answer',
     'SimpleCache',
+    'cached_response',
+    'clear_response_cache',
     'app_logger',
     'login_required',
     'admin_required'
@@ -10,6 +10,12 @@ from datetime import datetime
 
 from config import Config
 
+# 从文件尾部向前读取日志时的块大小
+LOG_TAIL_CHUNK_SIZE = 64 * 1024
+
+# 最近一次读取的日志尾部，按 (文件, 行数, mtime, 大小) 判断是否仍然有效
+_tail_cache = {'key': None, 'content': None}
+
 class Logger:
     """日志管理类"""
     
@@ -94,32 +100,50 @@ class Logger:
             
             # 读取日志文件
             if os.path.exists(log_file):
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    # 先读取文件尾部的行
-                    lines = []
-                    try:
-                        # 获取文件大小
-                        f.seek(0, os.SEEK_END)
-                        file_size = f.tell()
-                        
-                        # 如果文件较大，只读取最后部分
-                        if file_size > 500000:  # 约500KB
-                            f.seek(-500000, os.SEEK_END)
-                            # 丢弃第一行，可能是不完整的
-                            f.readline()
-                        else:
-                            f.seek(0)
-                        
-                        lines = f.readlines()
-                    except Exception as e:
-                        lines.append(f"读取日志时出错: {str(e)}")
-                    
-                    # 只返回最后max_lines行
-                    return ''.join(lines[-max_lines:]) if lines else "暂无日志记录"
+                st = os.stat(log_file)
+                cache_key = (log_file, max_lines, st.st_mtime_ns, st.st_size)
+                if _tail_cache['key'] == cache_key:
+                    return _tail_cache['content']
+
+                content = Logger._read_tail(log_file, max_lines)
+                _tail_cache['key'] = cache_key
+                _tail_cache['content'] = content
+                return content
             else:
                 return "日志文件不存在"
         except Exception as e:
             return f"读取日志文件时发生错误: {str(e)}"
 
+    @staticmethod
+    def _read_tail(log_file, max_lines):
+        """
+        从文件末尾按块向前读取，直到凑够max_lines行
+
+        Args:
+            log_file: 日志文件路径
+            max_lines: 最大返回行数
+
+        Returns:
+            str: 日志内容
+        """
+        try:
+            with open(log_file, 'rb') as f:
+                pos = f.seek(0, os.SEEK_END)
+                buf = b''
+                while pos > 0 and buf.count(b'\n') <= max_lines:
+                    size = min(LOG_TAIL_CHUNK_SIZE, pos)
+                    pos -= size
+                    f.seek(pos)
+                    buf = f.read(size) + buf
+        except Exception as e:
+            return f"读取日志时出错: {str(e)}"
+
+        lines = buf.splitlines(keepends=True)
+        if pos > 0 and lines:
+            # 丢弃第一行，可能是不完整的
+            lines = lines[1:]
+        lines = lines[-max_lines:]
+        return b''.join(lines).decode('utf-8', errors='replace') if lines else "暂无日志记录"
+
 # 创建默认的应用日志记录器
 app_logger = Logger("ai_answer_service").get_logger()
\ No newline at end of file
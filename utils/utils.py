@@ -5,8 +5,10 @@
 """
 import time
 import hashlib
+import threading
+from collections import OrderedDict
 from typing import Dict, Any, Optional
-from flask import session, redirect, render_template
+from flask import session, redirect, render_template, request, current_app
 from functools import wraps
 
 class SimpleCache:
@@ -96,6 +98,68 @@ class SimpleCache:
         return len(expired_keys)
 
 
+# 视图响应缓存：(用户ID, URL) -> (过期时间, 响应体, 状态码, 响应头)，按最近使用顺序排列
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+# 缓存条目上限，URL 带任意查询参数都会产生新条目，超出时淘汰最久未使用的
+RESPONSE_CACHE_MAX_ENTRIES = 256
+# 不随缓存回放的响应头，避免把一次请求的 Cookie 写给之后的请求
+_UNCACHED_HEADERS = frozenset({'set-cookie'})
+
+def _store_cached_response(key, entry) -> None:
+    """写入响应缓存，顺带清理过期条目并按上限淘汰"""
+    with _response_cache_lock:
+        now = time.monotonic()
+        expired_keys = [k for k, cached in _response_cache.items() if cached[0] <= now]
+        for k in expired_keys:
+            del _response_cache[k]
+        _response_cache[key] = entry
+        _response_cache.move_to_end(key)
+        while len(_response_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+            _response_cache.popitem(last=False)
+
+def cached_response(timeout: int = 3):
+    """
+    按用户和URL缓存视图的成功响应，适用于管理页面频繁轮询的只读接口
+
+    Args:
+        timeout: 缓存有效期（秒）
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped_view(*args, **kwargs):
+            # 页面可能包含当前用户信息，按用户区分缓存
+            key = (session.get('user_id'), request.full_path)
+            with _response_cache_lock:
+                entry = _response_cache.get(key)
+                if entry is not None:
+                    if entry[0] > time.monotonic():
+                        _response_cache.move_to_end(key)
+                    else:
+                        del _response_cache[key]
+                        entry = None
+            if entry is not None:
+                return current_app.response_class(entry[1], status=entry[2], headers=entry[3])
+
+            response = current_app.make_response(view_func(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                headers = [(name, value) for name, value in response.headers.items()
+                           if name.lower() not in _UNCACHED_HEADERS]
+                _store_cached_response(key, (
+                    time.monotonic() + timeout,
+                    response.get_data(),
+                    response.status_code,
+                    headers
+                ))
+            return response
+        return wrapped_view
+    return decorator
+
+def clear_response_cache() -> None:
+    """清空视图响应缓存（数据被修改后调用）"""
+    with _response_cache_lock:
+        _response_cache.clear()
+
 def format_answer_for_ocs(question: str, answer: str) -> Dict[str, Any]:
     """
     格式化答案为OCS期望的格式